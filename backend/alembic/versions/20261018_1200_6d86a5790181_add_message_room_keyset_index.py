@@ -0,0 +1,26 @@
+"""add message room keyset index
+
+Revision ID: 6d86a5790181
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+
+
+revision = "6d86a5790181"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_messages_room_id_created_at_id",
+        "messages",
+        ["room_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_room_id_created_at_id", table_name="messages")
@@ -0,0 +1,28 @@
+"""add photo renditions
+
+Revision ID: c4f2a8e61d3b
+Revises: b3e1c07a9d42
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c4f2a8e61d3b"
+down_revision = "b3e1c07a9d42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows predate the pipeline and are served as they are.
+    op.add_column("photos", sa.Column("status", sa.String(16), nullable=False, server_default="ready"))
+    op.add_column("photos", sa.Column("preview_url", sa.String(500), nullable=True))
+    op.add_column("photos", sa.Column("display_url", sa.String(500), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("photos", "display_url")
+    op.drop_column("photos", "preview_url")
+    op.drop_column("photos", "status")
@@ -0,0 +1,31 @@
+"""add storage objects
+
+Revision ID: e5a7c9d13f48
+Revises: d81b3f5c2e07
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e5a7c9d13f48"
+down_revision = "d81b3f5c2e07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "storage_objects",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("url", sa.String(500), nullable=False, unique=True),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("content_type", sa.String(100), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("storage_objects")
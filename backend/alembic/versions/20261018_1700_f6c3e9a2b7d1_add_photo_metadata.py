@@ -0,0 +1,38 @@
+"""add photo metadata
+
+Revision ID: f6c3e9a2b7d1
+Revises: e5a7c9d13f48
+Create Date: 2026-10-18 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "f6c3e9a2b7d1"
+down_revision = "e5a7c9d13f48"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled in by the rendition pipeline; rows rendered before this stay NULL.
+    op.add_column("photos", sa.Column("width", sa.Integer(), nullable=True))
+    op.add_column("photos", sa.Column("height", sa.Integer(), nullable=True))
+    op.add_column("photos", sa.Column("taken_at", sa.DateTime(), nullable=True))
+    op.add_column("photos", sa.Column("dominant_color", sa.String(7), nullable=True))
+    op.add_column("photos", sa.Column("blurhash", sa.String(64), nullable=True))
+    op.create_index(
+        "ix_photos_user_id_taken_at_id",
+        "photos",
+        ["user_id", "taken_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_photos_user_id_taken_at_id", table_name="photos")
+    op.drop_column("photos", "blurhash")
+    op.drop_column("photos", "dominant_color")
+    op.drop_column("photos", "taken_at")
+    op.drop_column("photos", "height")
+    op.drop_column("photos", "width")
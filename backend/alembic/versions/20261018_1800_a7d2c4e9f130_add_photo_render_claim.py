@@ -0,0 +1,25 @@
+"""add photo render claim
+
+Revision ID: a7d2c4e9f130
+Revises: f6c3e9a2b7d1
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a7d2c4e9f130"
+down_revision = "f6c3e9a2b7d1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # When a worker took a "processing" photo into its rendition queue; rows
+    # with no claim, or an old one, are resumed by the next worker to start.
+    op.add_column("photos", sa.Column("render_claimed_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("photos", "render_claimed_at")
@@ -0,0 +1,25 @@
+"""add upload session completing_at
+
+Revision ID: b8e3f5a1c264
+Revises: a7d2c4e9f130
+Create Date: 2026-10-18 19:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "b8e3f5a1c264"
+down_revision = "a7d2c4e9f130"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Set while a finalize assembles and stores the file, instead of holding
+    # a row lock for that long.
+    op.add_column("upload_sessions", sa.Column("completing_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("upload_sessions", "completing_at")
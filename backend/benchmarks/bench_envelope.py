@@ -0,0 +1,55 @@
+import argparse
+import json
+import timeit
+from datetime import datetime
+
+import local  # noqa: F401
+from websocket.envelope import Envelope
+
+
+def message():
+    return {
+        "type": "new_message",
+        "message": {
+            "id": 123456,
+            "content": "今天晚上一起吃火锅吗？🍲",
+            "message_type": "text",
+            "sender_id": 1,
+            "receiver_id": 2,
+            "room_id": 1,
+            "created_at": datetime.utcnow().isoformat(),
+        },
+    }
+
+
+def per_recipient(payload, recipients):
+    # The old path: json.dumps once for every queued recipient.
+    queue = []
+    for _ in range(recipients):
+        queue.append(json.dumps(payload))
+    return queue
+
+
+def encode_once(payload, recipients):
+    envelope = Envelope(payload)
+    queue = []
+    for _ in range(recipients):
+        queue.append(envelope.text)
+    return queue
+
+
+def main(args):
+    payload = message()
+    print(f"{'recipients':>10}  {'per-recipient':>14}  {'encode-once':>12}  speedup")
+    for recipients in args.recipients:
+        number = max(10, args.budget // recipients)
+        old = min(timeit.repeat(lambda: per_recipient(payload, recipients), number=number, repeat=5)) / number
+        new = min(timeit.repeat(lambda: encode_once(payload, recipients), number=number, repeat=5)) / number
+        print(f"{recipients:>10}  {old * 1e6:>12.1f}us  {new * 1e6:>10.1f}us  {old / new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU per room broadcast: json.dumps per recipient vs one shared Envelope")
+    parser.add_argument("--recipients", type=int, nargs="+", default=[2, 10, 100, 1000])
+    parser.add_argument("--budget", type=int, default=20000, help="recipient sends per timing run")
+    main(parser.parse_args())
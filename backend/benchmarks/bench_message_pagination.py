@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+
+import local  # noqa: F401
+from core.database import engine
+
+# Page latency by scroll depth over a large room: the old OR + OFFSET query
+# against the keyset query on ix_messages_room_id_created_at_id. Seeds the
+# room up to --messages rows first (tagged so --cleanup can remove them).
+
+CONTENT = "[bench] history"
+
+SEED = text("""
+    INSERT INTO messages (content, message_type, sender_id, receiver_id, room_id, created_at)
+    SELECT :content, 'text',
+           CASE WHEN n % 2 = 0 THEN :a ELSE :b END,
+           CASE WHEN n % 2 = 0 THEN :b ELSE :a END,
+           :room_id,
+           now() - make_interval(secs => n)
+    FROM generate_series(1, :count) AS n
+""")
+
+OFFSET_PAGE = text("""
+    SELECT * FROM messages
+    WHERE sender_id = :a OR receiver_id = :a
+    ORDER BY created_at DESC
+    OFFSET :depth LIMIT :limit
+""")
+
+KEYSET_PAGE = text("""
+    SELECT * FROM messages
+    WHERE room_id = :room_id AND (created_at, id) < (:created_at, :id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :limit
+""")
+
+CURSOR_AT = text("""
+    SELECT created_at, id FROM messages
+    WHERE room_id = :room_id
+    ORDER BY created_at DESC, id DESC
+    OFFSET :depth LIMIT 1
+""")
+
+
+async def timed(conn, statement, params, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        (await conn.execute(statement, params)).all()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def main(args):
+    ids = {"room_id": args.room_id, "a": args.user_a, "b": args.user_b}
+    async with engine.begin() as conn:
+        existing = (await conn.execute(
+            text("SELECT count(*) FROM messages WHERE room_id = :room_id"), ids
+        )).scalar_one()
+        if existing < args.messages:
+            print(f"seeding {args.messages - existing} messages...")
+            await conn.execute(SEED, {**ids, "content": CONTENT, "count": args.messages - existing})
+            await conn.execute(text("ANALYZE messages"))
+
+    async with engine.connect() as conn:
+        print(f"{'depth':>8}  {'offset':>10}  {'keyset':>10}")
+        for depth in args.depths:
+            cursor = (await conn.execute(CURSOR_AT, {**ids, "depth": depth})).first()
+            if cursor is None:
+                break
+            offset = await timed(conn, OFFSET_PAGE, {**ids, "depth": depth, "limit": args.limit}, args.repeat)
+            keyset = await timed(
+                conn, KEYSET_PAGE,
+                {**ids, "created_at": cursor.created_at, "id": cursor.id, "limit": args.limit},
+                args.repeat,
+            )
+            print(f"{depth:>8}  {offset * 1000:>8.2f}ms  {keyset * 1000:>8.2f}ms")
+
+    if args.cleanup:
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("DELETE FROM messages WHERE room_id = :room_id AND content = :content"),
+                {**ids, "content": CONTENT},
+            )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GET /messages page latency by scroll depth: OFFSET vs keyset")
+    parser.add_argument("--room-id", type=int, required=True)
+    parser.add_argument("--user-a", type=int, required=True)
+    parser.add_argument("--user-b", type=int, required=True)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10_000, 100_000, 500_000, 990_000])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--cleanup", action="store_true")
+    asyncio.run(main(parser.parse_args()))
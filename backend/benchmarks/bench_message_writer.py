@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import delete
+
+import local  # noqa: F401
+from core.database import AsyncSessionLocal, engine
+from models import Message
+from services.message_writer import MessageWriter
+from stats import percentile
+
+# Synthetic burst against a real database: N concurrent senders each write
+# their share of messages into one room, once with a commit per message
+# (the old send_message path) and once through the group-commit writer.
+# Rows are tagged and deleted afterwards; the receiver's unread counter is
+# left incremented by the writer run.
+
+CONTENT = "[bench] message"
+
+
+async def commit_per_message(values: dict):
+    async with AsyncSessionLocal() as db:
+        message = Message(**values)
+        db.add(message)
+        await db.commit()
+        await db.refresh(message)
+        return message.id
+
+
+async def burst(write, args) -> dict:
+    latencies = []
+
+    async def sender(n: int):
+        for i in range(n):
+            started = time.perf_counter()
+            await write({
+                "content": CONTENT,
+                "message_type": "text",
+                "sender_id": args.sender_id,
+                "receiver_id": args.receiver_id,
+                "room_id": args.room_id,
+            })
+            latencies.append(time.perf_counter() - started)
+
+    per_sender = args.messages // args.senders
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(per_sender) for _ in range(args.senders)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rate": per_sender * args.senders / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args):
+    writer = MessageWriter(max_batch_size=args.batch_size, max_delay=args.window_ms / 1000)
+    await writer.start()
+    try:
+        results = {
+            "commit/msg": await burst(commit_per_message, args),
+            "writer": await burst(writer.write, args),
+        }
+    finally:
+        await writer.stop()
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Message).where(Message.room_id == args.room_id, Message.content == CONTENT))
+            await db.commit()
+        await engine.dispose()
+
+    print(f"{args.messages} messages from {args.senders} concurrent senders")
+    print(f"{'path':>10}  {'msg/s':>8}  {'p50':>8}  {'p99':>8}")
+    for label, r in results.items():
+        print(f"{label:>10}  {r['rate']:>8.0f}  {r['p50']:>6.1f}ms  {r['p99']:>6.1f}ms")
+    print(f"writer batches: {writer.batches}, avg {writer.rows / max(writer.batches, 1):.1f} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Message persistence throughput: commit per message vs group commit")
+    parser.add_argument("--room-id", type=int, required=True)
+    parser.add_argument("--sender-id", type=int, required=True)
+    parser.add_argument("--receiver-id", type=int, required=True)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import time
+
+import local  # noqa: F401
+from core import security
+from core.security import PasswordHasher, get_password_hash, verify_password
+from stats import percentile
+
+# Runs a login storm while a ticker stands in for WebSocket pings, and
+# reports how late the ticks fire: inline bcrypt stalls the event loop, the
+# pool should keep the ticks on time.
+
+
+def stand_in(seconds: float):
+    def verify(plain, hashed):
+        time.sleep(seconds)
+        return True
+    return verify
+
+
+async def ticker(interval: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def storm(mode: str, args, hashed: str) -> dict:
+    verify = stand_in(args.stand_in_ms / 1000) if args.stand_in_ms else verify_password
+    hasher = None
+    if mode != "inline":
+        hasher = PasswordHasher(pool=mode, workers=args.workers, max_pending=args.logins)
+        if mode == "thread":
+            # PasswordHasher calls the module-level function, so swap it there.
+            # Worker processes import their own copy and always run bcrypt.
+            security.verify_password = verify
+
+    lags: list = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(args.tick_ms / 1000, lags, stop))
+    await asyncio.sleep(0.05)
+
+    async def login():
+        if hasher is None:
+            return verify("bench-password", hashed)
+        return await hasher.verify("bench-password", hashed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick
+    security.verify_password = verify_password
+    stats = hasher.stats() if hasher else {}
+    if hasher:
+        hasher.shutdown()
+    return {
+        "logins_per_s": args.logins / elapsed,
+        "lag_p50_ms": percentile(lags, 50) * 1000,
+        "lag_p99_ms": percentile(lags, 99) * 1000,
+        "lag_max_ms": max(lags, default=0) * 1000,
+        "max_queue_ms": stats.get("max_queue_ms", 0.0),
+    }
+
+
+async def main(args):
+    hashed = get_password_hash("bench-password")
+    print(f"{args.logins} concurrent logins, {args.workers} workers, tick every {args.tick_ms} ms")
+    print(f"{'mode':>8}  {'logins/s':>9}  {'lag p50':>8}  {'lag p99':>8}  {'lag max':>8}  {'max queue':>9}")
+    for mode in args.modes:
+        r = await storm(mode, args, hashed)
+        print(
+            f"{mode:>8}  {r['logins_per_s']:>9.1f}  {r['lag_p50_ms']:>6.1f}ms  {r['lag_p99_ms']:>6.1f}ms"
+            f"  {r['lag_max_ms']:>6.1f}ms  {r['max_queue_ms']:>7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event-loop lag during a login storm: inline bcrypt vs PasswordHasher pools")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    parser.add_argument("--stand-in-ms", type=float, default=0.0,
+                        help="replace bcrypt with a sleep of this many ms (inline and thread modes)")
+    asyncio.run(main(parser.parse_args()))
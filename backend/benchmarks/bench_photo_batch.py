@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import io
+import os
+import time
+
+import aiohttp
+
+from client import ensure_user
+
+# N sequential POST /photos against one POST /photos/batch on a running
+# server. Every file has unique bytes so neither run is served by dedup;
+# created photos are deleted afterwards.
+
+
+def make_files(count: int, size_kb: int):
+    files = []
+    for i in range(count):
+        try:
+            from PIL import Image
+
+            image = Image.frombytes("RGB", (512, 512), os.urandom(512 * 512 * 3))
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=95)
+            files.append((f"bench_{i}.jpg", buffer.getvalue(), "image/jpeg"))
+        except ImportError:
+            files.append((f"bench_{i}.bin", os.urandom(size_kb * 1024), "application/octet-stream"))
+    return files
+
+
+def form(files, field: str) -> aiohttp.FormData:
+    data = aiohttp.FormData()
+    for filename, body, content_type in files:
+        data.add_field(field, body, filename=filename, content_type=content_type)
+    return data
+
+
+async def main(args):
+    async with aiohttp.ClientSession() as session:
+        token = await ensure_user(session, args.base_url, args.username)
+        headers = {"Authorization": f"Bearer {token}"}
+        url = f"{args.base_url}/api/v1/photos"
+        created = []
+
+        files = make_files(args.files, args.size_kb)
+        started = time.perf_counter()
+        for file in files:
+            async with session.post(url, data=form([file], "file"), headers=headers) as response:
+                response.raise_for_status()
+                created.append((await response.json())["id"])
+        sequential = time.perf_counter() - started
+
+        files = make_files(args.files, args.size_kb)
+        started = time.perf_counter()
+        async with session.post(f"{url}/batch", data=form(files, "files"), headers=headers) as response:
+            response.raise_for_status()
+            result = await response.json()
+        batch = time.perf_counter() - started
+        created.extend(item["photo"]["id"] for item in result["items"] if item["photo"])
+
+        for photo_id in created:
+            async with session.delete(f"{url}/{photo_id}", headers=headers):
+                pass
+
+    total_mb = sum(len(body) for _, body, _ in files) / 1e6
+    print(f"{args.files} files, {total_mb:.1f} MB per run")
+    print(f"sequential POST /photos:  {sequential:.2f}s ({args.files / sequential:.1f} files/s)")
+    print(f"POST /photos/batch:       {batch:.2f}s ({args.files / batch:.1f} files/s), "
+          f"{result['succeeded']} ok / {result['failed']} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch upload vs N sequential uploads against a running server")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench_uploader")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size-kb", type=int, default=500, help="file size when Pillow is not installed")
+    asyncio.run(main(parser.parse_args()))
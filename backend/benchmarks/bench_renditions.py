@@ -0,0 +1,56 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import local  # noqa: F401
+from services.renditions import RENDITIONS, render_renditions
+
+
+def make_photo(path: str, width: int, height: int, seed: int):
+    from PIL import Image
+
+    # Noise over gradients compresses about like a real photo; flat colour
+    # would make the JPEG decode unrealistically cheap.
+    noise = Image.effect_noise((width, height), 40 + seed % 20)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    image = Image.merge("RGB", (noise, gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image.save(path, "JPEG", quality=90, exif=exif.tobytes())
+
+
+def run(paths, workers: int, quality: int) -> float:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm the workers up so process start-up is not measured.
+        list(executor.map(render_renditions, paths[:workers], [RENDITIONS] * workers, [quality] * workers))
+        started = time.perf_counter()
+        list(executor.map(render_renditions, paths, [RENDITIONS] * len(paths), [quality] * len(paths)))
+        return time.perf_counter() - started
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.photos):
+            path = os.path.join(directory, f"photo_{i}.jpg")
+            make_photo(path, args.width, args.height, i)
+            paths.append(path)
+        size_mb = sum(os.path.getsize(p) for p in paths) / len(paths) / 1e6
+
+        print(f"{args.photos} photos of {args.width}x{args.height} ({size_mb:.1f} MB avg), {os.cpu_count()} CPUs")
+        print(f"{'workers':>7}  {'photos/s':>8}  {'s/photo':>8}")
+        for workers in args.workers:
+            elapsed = run(paths, workers, args.quality)
+            print(f"{workers:>7}  {args.photos / elapsed:>8.2f}  {elapsed / args.photos:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rendition throughput at several process pool sizes")
+    parser.add_argument("--photos", type=int, default=16)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--quality", type=int, default=82)
+    main(parser.parse_args())
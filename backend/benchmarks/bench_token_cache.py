@@ -0,0 +1,42 @@
+import argparse
+import timeit
+from datetime import timedelta
+
+import local  # noqa: F401
+from core import security
+from core.security import create_access_token, decode_access_token, token_claims_cache
+
+
+def main(args):
+    tokens = [
+        create_access_token({"sub": str(i)}, expires_delta=timedelta(minutes=30))
+        for i in range(args.tokens)
+    ]
+    calls = [0]
+
+    def auth():
+        token = tokens[calls[0] % len(tokens)]
+        calls[0] += 1
+        assert decode_access_token(token) is not None
+
+    enabled = security.settings.token_cache_size
+    results = {}
+    for label, cache_size in (("jwt.decode", 0), ("cached", enabled)):
+        security.settings.token_cache_size = cache_size
+        token_claims_cache.clear()
+        for token in tokens:
+            decode_access_token(token)
+        results[label] = min(timeit.repeat(auth, number=args.number, repeat=5)) / args.number
+    security.settings.token_cache_size = enabled
+
+    print(f"{args.tokens} distinct tokens, {args.number} calls per run")
+    for label, seconds in results.items():
+        print(f"{label:>10}: {seconds * 1e6:7.2f}us per request")
+    print(f"   speedup: {results['jwt.decode'] / results['cached']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auth overhead per request with and without the verified-claims cache")
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+import asyncio
+import re
+from typing import Dict, List, Tuple
+
+import aiohttp
+
+PASSWORD = "bench-password"
+
+
+async def login(session: aiohttp.ClientSession, base_url: str, username: str) -> str:
+    async with session.post(
+        f"{base_url}/api/v1/auth/login", json={"username": username, "password": PASSWORD}
+    ) as response:
+        response.raise_for_status()
+        return (await response.json())["access_token"]
+
+
+async def ensure_user(session: aiohttp.ClientSession, base_url: str, username: str) -> str:
+    # Registering an existing user fails; logging in afterwards works either way.
+    async with session.post(
+        f"{base_url}/api/v1/auth/register",
+        json={
+            "username": username,
+            "email": f"{username}@bench.invalid",
+            "nickname": username,
+            "password": PASSWORD,
+        },
+    ) as response:
+        if response.status not in (201, 400):
+            response.raise_for_status()
+    return await login(session, base_url, username)
+
+
+async def ensure_users(
+    session: aiohttp.ClientSession, base_url: str, prefix: str, count: int, concurrency: int = 20
+) -> List[str]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> str:
+        async with slots:
+            return await ensure_user(session, base_url, f"{prefix}{i}")
+
+    return await asyncio.gather(*(one(i) for i in range(count)))
+
+
+async def ensure_couple(session: aiohttp.ClientSession, base_url: str, tokens: Tuple[str, str]) -> None:
+    # Binds the two users if the first one has no couple yet.
+    first, second = ({"Authorization": f"Bearer {token}"} for token in tokens)
+    async with session.get(f"{base_url}/api/v1/couples", headers=first) as response:
+        if response.status == 200:
+            return
+    async with session.post(f"{base_url}/api/v1/couples", json={}, headers=first) as response:
+        response.raise_for_status()
+        invite_code = (await response.json())["invite_code"]
+    async with session.post(
+        f"{base_url}/api/v1/couples/bind", json={"invite_code": invite_code}, headers=second
+    ) as response:
+        response.raise_for_status()
+
+
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$")
+
+
+async def read_metrics(session: aiohttp.ClientSession, base_url: str) -> Dict[str, float]:
+    async with session.get(f"{base_url}/metrics") as response:
+        response.raise_for_status()
+        text = await response.text()
+
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[name + (labels or "")] = float(value)
+    return samples
+
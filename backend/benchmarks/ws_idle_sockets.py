@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from client import ensure_users, read_metrics
+
+# Opens many idle WebSocket connections against a running server and reports
+# how many pooled DB connections they hold (db_pool_checked_out on /metrics).
+# With a session per event this should stay at ~0 however many sockets are
+# open; the old per-socket get_db held one each until the pool ran out.
+
+
+def pool_checked_out(samples) -> float:
+    return sum(v for k, v in samples.items() if k.startswith("db_pool_checked_out"))
+
+
+async def main(args):
+    ws_url = args.base_url.replace("http", "ws", 1) + "/ws/ws"
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        print(f"preparing {args.sockets} users...")
+        tokens = await ensure_users(session, args.base_url, args.prefix, args.sockets)
+        before = await read_metrics(session, args.base_url)
+
+        slots = asyncio.Semaphore(args.connect_concurrency)
+        sockets = []
+        started = time.perf_counter()
+
+        async def open_socket(token):
+            async with slots:
+                sockets.append(await session.ws_connect(ws_url, params={"token": token}, heartbeat=30))
+
+        results = await asyncio.gather(*(open_socket(t) for t in tokens), return_exceptions=True)
+        failed = sum(isinstance(r, Exception) for r in results)
+        print(f"opened {len(sockets)} sockets ({failed} failed) in {time.perf_counter() - started:.1f}s")
+
+        peak = 0.0
+        for _ in range(args.hold_seconds):
+            await asyncio.sleep(1)
+            samples = await read_metrics(session, args.base_url)
+            peak = max(peak, pool_checked_out(samples))
+
+        after = await read_metrics(session, args.base_url)
+        print(f"ws_connections:        {after.get('ws_connections', 0):.0f}")
+        print(f"db_pool_checked_out:   {pool_checked_out(before):.0f} before, peak {peak:.0f} while idle")
+        print(f"db_pool_size:          {sum(v for k, v in after.items() if k.startswith('db_pool_size')):.0f}")
+
+        await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Idle WebSocket load test: DB connections held per open socket")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--hold-seconds", type=int, default=10)
+    parser.add_argument("--prefix", default="bench_idle_")
+    asyncio.run(main(parser.parse_args()))
@@ -1,12 +1,12 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from typing import Annotated
 
-from core.database import get_db
+from core.database import get_db, current_user_id
 from core.security import decode_access_token
-from models import User
+from schemas.user import Principal
+from services.principal_cache import principal_cache
 
 security = HTTPBearer()
 
@@ -14,7 +14,7 @@ security = HTTPBearer()
 async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     db: AsyncSession = Depends(get_db),
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
@@ -30,19 +30,20 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.id == int(user_id)))
-    user = result.scalar_one_or_none()
+    user = await principal_cache.get(db, int(user_id))
     if user is None:
         raise credentials_exception
 
+    current_user_id.set(user.id)
+
     return user
 
 
 async def get_current_user_id(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ) -> int:
     return current_user.id
 
 
 UserIdDep = Annotated[int, Depends(get_current_user_id)]
-UserDep = Annotated[User, Depends(get_current_user)]
+UserDep = Annotated[Principal, Depends(get_current_user)]
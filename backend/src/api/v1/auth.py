@@ -4,8 +4,7 @@ from sqlalchemy import select
 
 from core.database import get_db
 from core.security import (
-    verify_password,
-    get_password_hash,
+    password_hasher,
     create_access_token,
     decode_access_token,
 )
@@ -40,7 +39,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         username=user_data.username,
         email=user_data.email,
         nickname=user_data.nickname,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await password_hasher.hash(user_data.password),
     )
     db.add(new_user)
     await db.commit()
@@ -59,7 +58,7 @@ async def login(
     )
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await password_hasher.verify(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -10,7 +10,9 @@ from schemas.user import UserResponse
 from schemas.couple import CoupleCreate, CoupleResponse, CoupleBind
 import secrets
 from datetime import datetime
-from api.dependencies import UserIdDep
+from api.dependencies import UserIdDep, UserDep
+from services.principal_cache import principal_cache
+from services.couple_graph import couple_graph_cache
 
 router = APIRouter(prefix="/couples", tags=["couples"])
 
@@ -50,6 +52,9 @@ async def create_couple(
     db.add(new_room)
     await db.commit()
 
+    await couple_graph_cache.invalidate(new_couple.id)
+    await principal_cache.invalidate([user_id])
+
     return new_couple
 
 
@@ -83,10 +88,11 @@ async def bind_couple(
             detail="邀请码无效"
         )
 
-    users_count = await db.execute(
-        select(User).where(User.couple_id == couple.id)
+    members_result = await db.execute(
+        select(User.id).where(User.couple_id == couple.id)
     )
-    if users_count.scalars().count() >= 2:
+    member_ids = list(members_result.scalars().all())
+    if len(member_ids) >= 2:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="该情侣关系已满员"
@@ -96,22 +102,17 @@ async def bind_couple(
     await db.commit()
     await db.refresh(user)
 
+    await couple_graph_cache.invalidate(couple.id)
+    await principal_cache.invalidate([user_id, *member_ids])
+
     return couple
 
 
 @router.get("", response_model=CoupleResponse)
 async def get_couple(
-    user_id: UserIdDep,
+    user: UserDep,
     db: AsyncSession = Depends(get_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     if not user.couple_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -131,27 +132,18 @@ async def get_couple(
 
 @router.get("/partner", response_model=UserResponse)
 async def get_partner(
-    user_id: UserIdDep,
+    user: UserDep,
     db: AsyncSession = Depends(get_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     if not user.couple_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户未绑定情侣关系"
         )
 
-    partner_result = await db.execute(
-        select(User).where(User.couple_id == user.couple_id, User.id != user_id)
-    )
-    partner = partner_result.scalar_one_or_none()
+    graph = await couple_graph_cache.get(db, user.couple_id)
+    partner_id = graph.partner_of(user.id)
+    partner = await principal_cache.get(db, partner_id) if partner_id else None
 
     if not partner:
         raise HTTPException(
@@ -4,10 +4,10 @@ from sqlalchemy import select, desc
 from typing import List
 from datetime import datetime
 
-from core.database import get_db
+from core.database import get_db, get_read_db
 from models import User, Diary
 from schemas.diary import DiaryCreate, DiaryUpdate, DiaryResponse
-from api.dependencies import UserIdDep
+from api.dependencies import UserIdDep, UserDep
 
 router = APIRouter(prefix="/diaries", tags=["diaries"])
 
@@ -15,17 +15,9 @@ router = APIRouter(prefix="/diaries", tags=["diaries"])
 @router.post("", response_model=DiaryResponse, status_code=status.HTTP_201_CREATED)
 async def create_diary(
     diary_data: DiaryCreate,
-    user_id: UserIdDep,
+    user: UserDep,
     db: AsyncSession = Depends(get_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     new_diary = Diary(
         title=diary_data.title,
         content=diary_data.content,
@@ -41,23 +33,15 @@ async def create_diary(
 
 @router.get("", response_model=List[DiaryResponse])
 async def get_diaries(
-    user_id: UserIdDep,
+    user: UserDep,
     skip: int = 0,
     limit: int = 20,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     if not user.couple_id:
         result = await db.execute(
             select(Diary)
-            .where(Diary.user_id == user_id)
+            .where(Diary.user_id == user.id)
             .order_by(desc(Diary.created_at))
             .offset(skip)
             .limit(limit)
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import List
-
-from core.database import get_db
-from models import User, Message, Room
-from schemas.message import MessageCreate, MessageResponse
-from api.dependencies import UserIdDep
+from sqlalchemy import select, desc, asc, tuple_
+
+from core.database import get_db, get_read_db, mark_recent_writes
+from core.metrics import messages_persisted
+from core.pagination import encode_cursor, decode_cursor
+from models import Message
+from schemas.user import Principal
+from schemas.message import MessageCreate, MessageResponse, MessagePage, ReadStateResponse, MarkRead
+from services.read_receipts import increment_unread, apply_watermarks, get_read_state
+from services.couple_graph import couple_graph_cache
+from api.dependencies import UserDep
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
@@ -14,40 +18,25 @@ router = APIRouter(prefix="/messages", tags=["messages"])
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
     message_data: MessageCreate,
-    sender_id: UserIdDep,
+    sender: UserDep,
     db: AsyncSession = Depends(get_db),
 ):
-    sender_result = await db.execute(select(User).where(User.id == sender_id))
-    sender = sender_result.scalar_one_or_none()
-    if not sender:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="发送者不存在"
-        )
-
     if not sender.couple_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户未绑定情侣关系"
         )
 
-    partner_result = await db.execute(
-        select(User).where(User.couple_id == sender.couple_id, User.id != sender.id)
-    )
-    partner = partner_result.scalar_one_or_none()
+    graph = await couple_graph_cache.get(db, sender.couple_id)
+    partner_id = graph.partner_of(sender.id)
 
-    if not partner:
+    if not partner_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="伴侣不存在"
         )
 
-    room_result = await db.execute(
-        select(Room).where(Room.couple_id == sender.couple_id)
-    )
-    room = room_result.scalar_one_or_none()
-
-    if not room:
+    if not graph.room_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="聊天房间不存在"
@@ -56,46 +45,104 @@ async def send_message(
     new_message = Message(
         content=message_data.content,
         message_type=message_data.message_type,
-        sender_id=sender_id,
-        receiver_id=partner.id,
-        room_id=room.id,
+        sender_id=sender.id,
+        receiver_id=partner_id,
+        room_id=graph.room_id,
     )
     db.add(new_message)
+    await increment_unread(db, {(partner_id, graph.room_id): 1})
     await db.commit()
     await db.refresh(new_message)
+    messages_persisted.inc(1, ("http",))
+    # The sender is marked by get_db; the partner reads the message next.
+    await mark_recent_writes([partner_id])
 
     return new_message
 
 
-@router.get("", response_model=List[MessageResponse])
+@router.get("", response_model=MessagePage)
 async def get_messages(
-    user_id: UserIdDep,
-    skip: int = 0,
-    limit: int = 50,
-    db: AsyncSession = Depends(get_db),
+    user: UserDep,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
+    if not user.couple_id:
+        return MessagePage(items=[], has_more=False)
+
+    room_id = (await couple_graph_cache.get(db, user.couple_id)).room_id
+    if room_id is None:
+        return MessagePage(items=[], has_more=False)
+
+    # Keyset pagination on (created_at, id) within the room, served by
+    # ix_messages_room_id_created_at_id. Without a cursor, the newest page is
+    # returned; "before" scrolls back, "after" catches up.
+    key = tuple_(Message.created_at, Message.id)
+    query = select(Message).where(Message.room_id == room_id)
+    if after:
+        query = query.where(key > tuple_(*decode_cursor(after))).order_by(
+            asc(Message.created_at), asc(Message.id)
+        )
+    else:
+        if before:
+            query = query.where(key < tuple_(*decode_cursor(before)))
+        query = query.order_by(desc(Message.created_at), desc(Message.id))
+
+    result = await db.execute(query.limit(limit + 1))
+    messages = list(result.scalars().all())
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    next_cursor = None
+    if has_more:
+        last = messages[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    if not after:
+        messages.reverse()
+
+    return MessagePage(
+        items=[MessageResponse.model_validate(m) for m in messages],
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+async def get_user_room_id(db: AsyncSession, user: Principal) -> int:
+    room_id = None
+    if user.couple_id:
+        room_id = (await couple_graph_cache.get(db, user.couple_id)).room_id
+    if room_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
+            detail="聊天房间不存在"
         )
+    return room_id
 
-    if not user.couple_id:
-        return []
 
-    result = await db.execute(
-        select(Message)
-        .where(
-            (Message.sender_id == user_id) | (Message.receiver_id == user_id)
-        )
-        .order_by(desc(Message.created_at))
-        .offset(skip)
-        .limit(limit)
-    )
-    messages = result.scalars().all()
-    return list(reversed(messages))
+@router.get("/unread", response_model=ReadStateResponse)
+async def get_unread(
+    user: UserDep,
+    db: AsyncSession = Depends(get_db),
+):
+    room_id = await get_user_room_id(db, user)
+    state = await get_read_state(db, user.id, room_id)
+    if state is None:
+        return ReadStateResponse(room_id=room_id)
+    return ReadStateResponse.model_validate(state, from_attributes=True)
+
+
+@router.put("/read", response_model=ReadStateResponse)
+async def mark_read(
+    read_data: MarkRead,
+    user: UserDep,
+    db: AsyncSession = Depends(get_db),
+):
+    room_id = await get_user_room_id(db, user)
+    states = await apply_watermarks(db, {(user.id, room_id): read_data.message_id})
+    await db.commit()
+    return ReadStateResponse.model_validate(states[0], from_attributes=True)
 
 
 @router.get("/{message_id}", response_model=MessageResponse)
@@ -1,68 +1,337 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import List
+from sqlalchemy import select, desc, or_, tuple_, union_all
+from sqlalchemy.orm import aliased
+from typing import List, Optional
+import asyncio
+import mimetypes
+import os
 
-from core.database import get_db
+from loguru import logger
+
+from core.config import get_settings
+from core.database import get_db, get_read_db
+from core.pagination import encode_cursor, decode_cursor
 from models import User, Photo
-from schemas.photo import PhotoCreate, PhotoResponse
-from api.dependencies import UserIdDep
+from models.storage_object import StorageObject
+from schemas.photo import (
+    PhotoCreate,
+    PhotoResponse,
+    PhotoFromHash,
+    DirectUploadCreate,
+    DirectUploadResponse,
+    DirectUploadComplete,
+    PhotoPage,
+    PhotoBatchItem,
+    PhotoBatchResponse,
+)
+from schemas.user import Principal
+from services.content_store import find_object, release, purge, discard
+from services.direct_uploads import grant_direct_upload, get_direct_upload, revoke_direct_upload
+from services.media import (
+    accel_response,
+    file_response,
+    content_etag,
+    etag_matches,
+    media_headers,
+    media_type,
+    IMMUTABLE_CACHE,
+    REVALIDATE_CACHE,
+)
+from services.couple_graph import couple_graph_cache
+from services.photo_ingest import add_photo, commit_photos, schedule_renditions
+from services.storage_service import get_storage_service, iter_upload, content_filename, StoredFile, UploadTooLarge
+from api.dependencies import UserIdDep, UserDep
+
+settings = get_settings()
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 
 @router.post("", response_model=PhotoResponse, status_code=status.HTTP_201_CREATED)
 async def upload_photo(
-    user_id: UserIdDep,
+    user: UserDep,
     file: UploadFile = File(...),
     caption: str | None = None,
     db: AsyncSession = Depends(get_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
+    storage = get_storage_service()
+    try:
+        stored = await storage.upload_content(
+            iter_upload(file),
+            file.content_type,
+            max_size=settings.max_upload_size,
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="文件过大"
+        )
+
+    try:
+        new_photo = await add_photo(db, stored, file.filename, caption, user.id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await discard([stored])
+        raise
+    await db.refresh(new_photo)
+
+    schedule_renditions([new_photo])
+
+    return new_photo
+
+
+@router.post("/batch", response_model=PhotoBatchResponse, status_code=status.HTTP_201_CREATED)
+async def upload_photos_batch(
+    user: UserDep,
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+):
+    if len(files) > settings.photo_batch_max_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多上传 {settings.photo_batch_max_files} 张照片"
+        )
+
+    # Storing a batch takes a while; do not keep a pooled connection
+    # checked out in the meantime.
+    await db.close()
+
+    storage = get_storage_service()
+    slots = asyncio.Semaphore(settings.photo_batch_concurrency)
+
+    async def store(file: UploadFile):
+        async with slots:
+            try:
+                stored = await storage.upload_content(
+                    iter_upload(file), file.content_type, max_size=settings.max_upload_size
+                )
+                return stored, None
+            except UploadTooLarge:
+                return None, "文件过大"
+            except Exception as e:
+                logger.error(f"Batch upload of {file.filename} failed: {e}")
+                return None, "上传失败"
+
+    results = await asyncio.gather(*(store(file) for file in files))
+
+    stored_files = [
+        (stored, file.filename, None)
+        for file, (stored, _) in zip(files, results)
+        if stored is not None
+    ]
+    outcomes = []
+    if stored_files:
+        outcomes = await commit_photos(db, stored_files, user.id)
+        created = [photo for photo, _ in outcomes if photo is not None]
+        if created:
+            # One SELECT for the server-generated columns instead of a
+            # refresh per photo.
+            await db.execute(
+                select(Photo)
+                .where(Photo.id.in_([photo.id for photo in created]))
+                .execution_options(populate_existing=True)
+            )
+            schedule_renditions(created)
+
+    items = []
+    saved = iter(outcomes)
+    for file, (stored, error) in zip(files, results):
+        photo = None
+        if stored is not None:
+            photo, error = next(saved)
+        if photo is None:
+            items.append(PhotoBatchItem(filename=file.filename, error=error))
+        else:
+            items.append(PhotoBatchItem(
+                filename=file.filename,
+                photo=PhotoResponse.model_validate(photo),
+                deduplicated=stored.deduplicated,
+            ))
+
+    succeeded = sum(1 for item in items if item.photo is not None)
+    return PhotoBatchResponse(
+        items=items,
+        succeeded=succeeded,
+        failed=len(files) - succeeded,
+    )
+
+
+async def object_visible(db: AsyncSession, user: Principal, obj: StorageObject) -> bool:
+    owner = Photo.user_id == user.id
+    if user.couple_id:
+        owner = or_(owner, User.couple_id == user.couple_id)
+
+    result = await db.execute(
+        select(Photo.id)
+        .join(User, Photo.user_id == User.id)
+        .where(Photo.url == obj.url, owner)
+        .limit(1)
+    )
+    return result.first() is not None
+
+
+async def find_visible_object(db: AsyncSession, user: Principal, sha256: str) -> Optional[StorageObject]:
+    # Only content the couple already has can be claimed by hash, otherwise
+    # knowing a hash would be enough to obtain anyone's photo.
+    obj = await find_object(db, sha256)
+    if obj is None or not await object_visible(db, user, obj):
+        return None
+    return obj
+
+
+@router.post("/from-hash", response_model=PhotoResponse, status_code=status.HTTP_201_CREATED)
+async def create_photo_from_hash(
+    photo_data: PhotoFromHash,
+    user: UserDep,
+    db: AsyncSession = Depends(get_db),
+):
+    # Lets the second phone skip the upload entirely.
+    obj = await find_visible_object(db, user, photo_data.sha256)
+    if obj is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
+            detail="内容不存在，请上传文件"
         )
 
-    url = f"https://placeholder.com/photos/{file.filename}"
-    thumbnail_url = f"https://placeholder.com/photos/thumb_{file.filename}"
+    stored = StoredFile(obj.url, obj.url, obj.size, obj.sha256, obj.content_type, deduplicated=True)
+    new_photo = await add_photo(db, stored, photo_data.filename, photo_data.caption, user.id)
+    await db.commit()
+    await db.refresh(new_photo)
+
+    schedule_renditions([new_photo])
+
+    return new_photo
+
+
+@router.post("/direct-uploads", response_model=DirectUploadResponse)
+async def create_direct_upload(
+    upload_data: DirectUploadCreate,
+    user: UserDep,
+    db: AsyncSession = Depends(get_db),
+):
+    if not settings.storage_presigned_uploads:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="未启用直传"
+        )
+
+    if upload_data.size > settings.max_upload_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="文件过大"
+        )
 
-    new_photo = Photo(
-        filename=file.filename,
-        url=url,
-        thumbnail_url=thumbnail_url,
-        caption=caption,
-        user_id=user.id,
+    obj = await find_object(db, upload_data.sha256)
+    if obj is not None:
+        if await object_visible(db, user, obj):
+            return DirectUploadResponse(exists=True)
+        # Content stored for someone else: completing would only HEAD the
+        # existing object, so the bytes have to come through a normal upload.
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="请通过普通上传提交此文件"
+        )
+
+    presigned = await get_storage_service().presigned_put(upload_data.sha256, upload_data.content_type)
+    if presigned is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="未启用直传"
+        )
+
+    await grant_direct_upload(user.id, upload_data.sha256, upload_data.size, upload_data.content_type)
+
+    return DirectUploadResponse(
+        upload_url=presigned["url"],
+        headers=presigned["headers"],
+        expires_in=presigned["expires_in"],
     )
-    db.add(new_photo)
+
+
+@router.post("/direct-uploads/complete", response_model=PhotoResponse, status_code=status.HTTP_201_CREATED)
+async def complete_direct_upload(
+    photo_data: DirectUploadComplete,
+    user: UserDep,
+    db: AsyncSession = Depends(get_db),
+):
+    if not settings.storage_presigned_uploads:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="未启用直传"
+        )
+
+    grant = await get_direct_upload(user.id, photo_data.sha256)
+    if grant is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="直传凭证无效或已过期"
+        )
+
+    storage = get_storage_service()
+    size = await storage.stat_content(photo_data.sha256)
+    if size is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件尚未上传"
+        )
+
+    filename = content_filename(photo_data.sha256)
+    url = await storage.get_file_url(filename)
+    # The presigned PUT pins the bytes but not their size.
+    if size > settings.max_upload_size:
+        await revoke_direct_upload(user.id, photo_data.sha256)
+        await purge([url])
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="文件过大"
+        )
+    if size != grant["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件大小不符"
+        )
+
+    existing = await find_object(db, photo_data.sha256)
+    if existing is not None and not await object_visible(db, user, existing):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="请通过普通上传提交此文件"
+        )
+
+    stored = StoredFile(
+        url,
+        filename,
+        size,
+        photo_data.sha256,
+        grant["content_type"],
+        deduplicated=existing is not None,
+    )
+    new_photo = await add_photo(db, stored, photo_data.filename, photo_data.caption, user.id)
     await db.commit()
     await db.refresh(new_photo)
+    await revoke_direct_upload(user.id, photo_data.sha256)
+
+    schedule_renditions([new_photo])
 
     return new_photo
 
 
 @router.get("", response_model=List[PhotoResponse])
 async def get_photos(
-    user_id: UserIdDep,
+    user: UserDep,
     skip: int = 0,
     limit: int = 20,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     if not user.couple_id:
         return []
 
     result = await db.execute(
         select(Photo)
+        .join(User, Photo.user_id == User.id)
         .where(User.couple_id == user.couple_id)
         .order_by(desc(Photo.created_at))
         .offset(skip)
@@ -72,6 +341,141 @@ async def get_photos(
     return list(photos)
 
 
+@router.get("/timeline", response_model=PhotoPage)
+async def get_photo_timeline(
+    user: UserDep,
+    before: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if not user.couple_id:
+        return PhotoPage(items=[], has_more=False)
+
+    # Newest capture first, keyset paginated on (taken_at, id). Photos
+    # without a capture time (videos, images without EXIF, renditions still
+    # pending) are not listed.
+    cursor = decode_cursor(before) if before else None
+    graph = await couple_graph_cache.get(db, user.couple_id)
+
+    # One backward range scan of ix_photos_user_id_taken_at_id per member,
+    # merged by the outer ORDER BY; filtering on the couple through a join
+    # would make Postgres sort both partners' photos instead.
+    key = tuple_(Photo.taken_at, Photo.id)
+    branches = []
+    for member_id in graph.member_ids:
+        branch = select(Photo).where(Photo.user_id == member_id, Photo.taken_at.isnot(None))
+        if cursor:
+            branch = branch.where(key < tuple_(*cursor))
+        branches.append(branch.order_by(desc(Photo.taken_at), desc(Photo.id)).limit(limit + 1))
+    if not branches:
+        return PhotoPage(items=[], has_more=False)
+
+    page = aliased(Photo, union_all(*branches).subquery())
+    result = await db.execute(
+        select(page).order_by(desc(page.taken_at), desc(page.id)).limit(limit + 1)
+    )
+    photos = list(result.scalars().all())
+
+    has_more = len(photos) > limit
+    photos = photos[:limit]
+    next_cursor = None
+    if has_more:
+        last = photos[-1]
+        next_cursor = encode_cursor(last.taken_at, last.id)
+
+    return PhotoPage(
+        items=[PhotoResponse.model_validate(p) for p in photos],
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+MEDIA_VARIANTS = {
+    "original": "url",
+    "display": "display_url",
+    "preview": "preview_url",
+    "thumbnail": "thumbnail_url",
+}
+
+
+@router.get("/{photo_id}/media/{variant}")
+async def get_photo_media(
+    photo_id: int,
+    variant: str,
+    request: Request,
+    user: UserDep,
+    db: AsyncSession = Depends(get_read_db),
+):
+    if variant not in MEDIA_VARIANTS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="照片不存在"
+        )
+
+    result = await db.execute(
+        select(Photo, User.couple_id, StorageObject.content_type)
+        .join(User, Photo.user_id == User.id)
+        .outerjoin(StorageObject, StorageObject.url == Photo.url)
+        .where(Photo.id == photo_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="照片不存在"
+        )
+
+    photo, owner_couple_id, stored_content_type = row
+    if photo.user_id != user.id and (not user.couple_id or owner_couple_id != user.couple_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权限查看此照片"
+        )
+
+    # Renditions that are not ready yet fall back to the original.
+    url = getattr(photo, MEDIA_VARIANTS[variant]) or photo.url
+    if url != photo.url:
+        content_type = "image/jpeg"
+    elif stored_content_type:
+        content_type = media_type(stored_content_type)
+    else:
+        # Uploads from before the content store have no stored type.
+        content_type = media_type(mimetypes.guess_type(photo.filename)[0])
+
+    storage = get_storage_service()
+    key = storage.object_key(url)
+    if key is None:
+        # Object storage: let the client fetch it from the bucket directly.
+        presigned = await storage.presigned_get_url(url, content_type)
+        if presigned is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="文件不存在"
+            )
+        return RedirectResponse(presigned, headers={"Cache-Control": "private, no-store"})
+
+    etag = content_etag(key)
+    cache_control = IMMUTABLE_CACHE if etag else REVALIDATE_CACHE
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, **media_headers(content_type, cache_control)},
+        )
+
+    if settings.media_accel_redirect:
+        return accel_response(key, content_type, etag, cache_control)
+
+    try:
+        return await file_response(
+            request, os.path.join(settings.upload_dir, key), content_type, etag, cache_control
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+
+
 @router.delete("/{photo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_photo(
     photo_id: int,
@@ -92,7 +496,12 @@ async def delete_photo(
             detail="无权限删除此照片"
         )
 
+    unreferenced = await release(
+        db, [photo.url, photo.thumbnail_url, photo.preview_url, photo.display_url]
+    )
     await db.delete(photo)
     await db.commit()
 
+    await purge(unreferenced)
+
     return None
@@ -4,10 +4,10 @@ from sqlalchemy import select, desc
 from typing import List
 from datetime import datetime
 
-from core.database import get_db
+from core.database import get_db, get_read_db
 from models import User, Todo
 from schemas.todo import TodoCreate, TodoUpdate, TodoResponse
-from api.dependencies import UserIdDep
+from api.dependencies import UserIdDep, UserDep
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
@@ -15,17 +15,9 @@ router = APIRouter(prefix="/todos", tags=["todos"])
 @router.post("", response_model=TodoResponse, status_code=status.HTTP_201_CREATED)
 async def create_todo(
     todo_data: TodoCreate,
-    user_id: UserIdDep,
+    user: UserDep,
     db: AsyncSession = Depends(get_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     new_todo = Todo(
         title=todo_data.title,
         description=todo_data.description,
@@ -41,24 +33,16 @@ async def create_todo(
 
 @router.get("", response_model=List[TodoResponse])
 async def get_todos(
-    user_id: UserIdDep,
+    user: UserDep,
     skip: int = 0,
     limit: int = 20,
     completed_only: bool = False,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
-
     if not user.couple_id:
         result = await db.execute(
             select(Todo)
-            .where(Todo.user_id == user_id)
+            .where(Todo.user_id == user.id)
             .order_by(desc(Todo.created_at))
             .offset(skip)
             .limit(limit)
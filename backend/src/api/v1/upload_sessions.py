@@ -0,0 +1,214 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, or_
+from datetime import datetime, timedelta
+
+from core.config import get_settings
+from core.database import get_db
+from models.upload_session import UploadSession
+from schemas.photo import PhotoResponse
+from schemas.upload import UploadSessionCreate, UploadSessionResponse, UploadSessionComplete
+from services.photo_ingest import add_photo, schedule_renditions
+from services.content_store import discard
+from services.storage_service import get_storage_service
+from services.upload_sessions import (
+    new_upload_session,
+    write_chunk,
+    received_chunks,
+    iter_assembled,
+    discard_session_files,
+    ChunkSizeMismatch,
+)
+from api.dependencies import UserIdDep
+
+settings = get_settings()
+
+router = APIRouter(prefix="/photos/upload-sessions", tags=["photos"])
+
+
+async def get_owned_session(db: AsyncSession, session_id: str, user_id: int) -> UploadSession:
+    query = select(UploadSession).where(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user_id,
+        UploadSession.expires_at > datetime.utcnow(),
+    )
+    result = await db.execute(query)
+    session = result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在"
+        )
+    return session
+
+
+def session_response(session: UploadSession, received: list[int]) -> UploadSessionResponse:
+    response = UploadSessionResponse.model_validate(session)
+    response.received = received
+    return response
+
+
+async def claim_session(db: AsyncSession, session_id: str, user_id: int) -> UploadSession:
+    # Only one finalize runs at a time; a claim left behind by a worker that
+    # died is taken over once it is old enough.
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.upload_session_complete_timeout_seconds)
+    result = await db.execute(
+        update(UploadSession)
+        .where(
+            UploadSession.id == session_id,
+            UploadSession.user_id == user_id,
+            UploadSession.expires_at > now,
+            or_(UploadSession.completing_at.is_(None), UploadSession.completing_at < stale),
+        )
+        .values(completing_at=now)
+        .returning(UploadSession)
+        .execution_options(synchronize_session=False)
+    )
+    session = result.scalar_one_or_none()
+    await db.commit()
+    if session is None:
+        await get_owned_session(db, session_id, user_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="上传正在完成中"
+        )
+    return session
+
+
+async def release_session(db: AsyncSession, session: UploadSession):
+    # A no-op if another finalize has taken the claim over in the meantime.
+    await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session.id, UploadSession.completing_at == session.completing_at)
+        .values(completing_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+@router.post("", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    session_data: UploadSessionCreate,
+    user_id: UserIdDep,
+    db: AsyncSession = Depends(get_db),
+):
+    if session_data.size > settings.upload_session_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="文件过大"
+        )
+
+    session = new_upload_session(
+        user_id, session_data.filename, session_data.content_type, session_data.size
+    )
+    db.add(session)
+    await db.commit()
+
+    return session_response(session, [])
+
+
+@router.get("/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    session_id: str,
+    user_id: UserIdDep,
+    db: AsyncSession = Depends(get_db),
+):
+    session = await get_owned_session(db, session_id, user_id)
+    return session_response(session, await received_chunks(session))
+
+
+@router.put("/{session_id}/chunks/{index}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    session_id: str,
+    index: int,
+    request: Request,
+    user_id: UserIdDep,
+    db: AsyncSession = Depends(get_db),
+):
+    session = await get_owned_session(db, session_id, user_id)
+    # A chunk can take a while to arrive on a mobile link; do not hold a
+    # pooled connection while the body streams in.
+    await db.close()
+
+    if not 0 <= index < session.total_chunks:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="分片序号无效"
+        )
+
+    try:
+        await write_chunk(session, index, request.stream())
+    except ChunkSizeMismatch:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="分片大小不正确"
+        )
+
+    return None
+
+
+@router.post("/{session_id}/complete", response_model=PhotoResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload_session(
+    session_id: str,
+    complete_data: UploadSessionComplete,
+    user_id: UserIdDep,
+    db: AsyncSession = Depends(get_db),
+):
+    session = await claim_session(db, session_id, user_id)
+    # Assembling and storing can take minutes for a large video; no pooled
+    # connection or row lock is held meanwhile.
+    await db.close()
+
+    stored = None
+    try:
+        received = await received_chunks(session)
+        if len(received) != session.total_chunks:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="分片未上传完整"
+            )
+
+        storage = get_storage_service()
+        stored = await storage.upload_content(iter_assembled(session), session.content_type)
+
+        new_photo = await add_photo(db, stored, session.filename, complete_data.caption, user_id)
+        # Still ours only if no other finalize took over a timed-out claim.
+        result = await db.execute(
+            delete(UploadSession).where(
+                UploadSession.id == session_id,
+                UploadSession.completing_at == session.completing_at,
+            )
+        )
+        if result.rowcount == 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="上传正在完成中"
+            )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        if stored is not None:
+            await discard([stored])
+        await release_session(db, session)
+        raise
+    await db.refresh(new_photo)
+
+    await discard_session_files(session_id)
+    schedule_renditions([new_photo])
+
+    return new_photo
+
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(
+    session_id: str,
+    user_id: UserIdDep,
+    db: AsyncSession = Depends(get_db),
+):
+    session = await get_owned_session(db, session_id, user_id)
+    await db.delete(session)
+    await db.commit()
+    await discard_session_files(session_id)
+
+    return None
@@ -5,23 +5,14 @@ from sqlalchemy import select
 from core.database import get_db
 from models import User
 from schemas.user import UserResponse, UserUpdate
-from api.dependencies import UserIdDep
+from api.dependencies import UserIdDep, UserDep
+from services.principal_cache import principal_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(
-    user_id: UserIdDep,
-    db: AsyncSession = Depends(get_db),
-):
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="用户不存在"
-        )
+async def get_current_user(user: UserDep):
     return user
 
 
@@ -49,4 +40,6 @@ async def update_user(
     await db.commit()
     await db.refresh(user)
 
+    await principal_cache.invalidate([user_id])
+
     return user
@@ -4,12 +4,95 @@ from functools import lru_cache
 
 class Settings(BaseSettings):
     database_url: str
+    database_read_url: str | None = None
     redis_url: str
     secret_key: str
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    token_cache_size: int = 10000  # verified JWT claims cache, 0 disables
+
+    # Database pool
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100  # asyncpg prepared statements, 0 behind pgbouncer
+    db_echo: bool = False
+    db_read_after_write_seconds: int = 5
+
+    # SQL instrumentation
+    sql_instrumentation: bool = True
+    sql_n_plus_one_threshold: int = 3
+    sql_slow_request_ms: int = 200
+    sql_stats_headers: bool = False  # dev only: includes raw SQL text
+
+    # Metrics
+    metrics_enabled: bool = True
+
+    # Password hashing pool
+    password_hash_pool: str = "thread"  # "thread" or "process"
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+
+    # WebSocket
+    broadcast_backend: str = "memory"  # "memory" or "redis"
+    ws_send_queue_size: int = 256
+    ws_overflow_policy: str = "drop_ephemeral"  # "drop_ephemeral" or "disconnect"
+    ws_sync_chunk_size: int = 100
+    ws_sync_max_messages: int = 2000
+    typing_refresh_interval_ms: int = 3000
+    typing_timeout_ms: int = 6000
+
+    # Chat message group commit
+    message_batch_size: int = 200
+    message_batch_window_ms: int = 5
+    read_receipt_flush_ms: int = 1000
+
+    # Authenticated principal cache
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_redis: bool = False
+    principal_cache_redis_ttl_seconds: int = 300
+
+    # Couple membership graph cache (couple -> members, room)
+    couple_graph_cache_size: int = 10000
+    couple_graph_cache_ttl_seconds: int = 60
+    couple_graph_cache_redis: bool = True
+    couple_graph_cache_redis_ttl_seconds: int = 3600
 
     # Storage
+    storage_backend: str = "local"  # "local", "s3", "oss" or "cos"
+    storage_public_base_url: str | None = None
+    storage_max_pool_connections: int = 50
+    storage_multipart_part_size: int = 8 * 1024 * 1024
+    storage_multipart_concurrency: int = 4
+    storage_presigned_uploads: bool = False
+    storage_presign_expires_seconds: int = 900
+    s3_endpoint_url: str | None = None  # MinIO or another S3-compatible endpoint
+    upload_dir: str = "uploads/"
+    upload_chunk_size: int = 1024 * 1024
+    max_upload_size: int = 20 * 1024 * 1024
+    photo_batch_max_files: int = 50
+    photo_batch_concurrency: int = 4
+    # Hand authorized media downloads to nginx (internal location below)
+    media_accel_redirect: bool = False
+    media_accel_prefix: str = "/protected-uploads/"
+
+    # Resumable upload sessions
+    upload_session_dir: str = "upload_sessions/"
+    upload_session_chunk_size: int = 5 * 1024 * 1024
+    upload_session_max_size: int = 1024 * 1024 * 1024
+    upload_session_ttl_hours: int = 24
+    upload_session_gc_interval_seconds: int = 600
+    upload_session_complete_timeout_seconds: int = 1800
+
+    # Photo renditions (thumbnail / preview / display), built in a process pool
+    rendition_workers: int = 2
+    rendition_max_pending: int = 1000
+    rendition_quality: int = 82
+    rendition_claim_seconds: int = 900  # after this a queued photo may be claimed again
+
     oss_access_key_id: str | None = None
     oss_access_key_secret: str | None = None
     oss_bucket_name: str | None = None
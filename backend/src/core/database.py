@@ -1,25 +1,136 @@
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+from loguru import logger
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session, declarative_base
 
+from .cache import TTLCache
 from .config import get_settings
+from .metrics import registry
+from .query_stats import instrument_engine
+from .redis import get_redis
 
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True,
+
+def create_engine_for(url: str):
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["statement_cache_size"] = settings.db_statement_cache_size
+
+    return create_async_engine(
+        url,
+        echo=settings.db_echo,
+        future=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+
+
+engine = create_engine_for(settings.database_url)
+read_engine = (
+    create_engine_for(settings.database_read_url) if settings.database_read_url else engine
 )
 
+if settings.sql_instrumentation:
+    instrument_engine(engine)
+    if read_engine is not engine:
+        instrument_engine(read_engine)
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 
+def _pool_stats(read: Callable) -> dict:
+    engines = {("primary",): engine}
+    if read_engine is not engine:
+        engines[("replica",)] = read_engine
+    return {labels: read(e.pool) for labels, e in engines.items()}
+
+
+registry.callback_gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool",
+    lambda: _pool_stats(lambda pool: pool.checkedout()), ("engine",),
+)
+registry.callback_gauge(
+    "db_pool_overflow", "Connections open beyond pool_size",
+    lambda: _pool_stats(lambda pool: max(pool.overflow(), 0)), ("engine",),
+)
+registry.callback_gauge(
+    "db_pool_size", "Configured pool size",
+    lambda: _pool_stats(lambda pool: pool.size()), ("engine",),
+)
+
+# Set by the auth dependency so that a user who just wrote keeps reading from
+# the primary until the replica has had time to catch up. The marker is kept
+# in this worker and in Redis, so that the user's next request is pinned
+# whichever uvicorn worker it lands on.
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+_recent_writers = TTLCache(maxsize=100000, ttl=settings.db_read_after_write_seconds)
+RECENT_WRITE_PREFIX = "couple_space:recent_write:"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+async def mark_recent_writes(user_ids: Iterable[int]):
+    # Called by writers outside get_db (the socket message writer, read
+    # receipts) for every user whose reads the write affects.
+    if read_engine is engine:
+        return
+    user_ids = set(user_ids)
+    for user_id in user_ids:
+        _recent_writers.set(user_id, True)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.set(f"{RECENT_WRITE_PREFIX}{user_id}", 1, ex=settings.db_read_after_write_seconds)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Recent write marker Redis write failed: {e}")
+
+
+async def _wrote_recently(user_id: int) -> bool:
+    if _recent_writers.get(user_id):
+        return True
+    try:
+        return bool(await get_redis().exists(f"{RECENT_WRITE_PREFIX}{user_id}"))
+    except Exception as e:
+        logger.warning(f"Recent write marker Redis read failed: {e}")
+        return False
+
+
+async def _remember_write(session: AsyncSession):
+    user_id = current_user_id.get()
+    if user_id is not None and session.sync_session.info.get("wrote"):
+        await mark_recent_writes([user_id])
+
+
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         try:
@@ -28,5 +139,19 @@ async def get_db() -> AsyncSession:
         except Exception:
             await session.rollback()
             raise
+        finally:
+            await _remember_write(session)
+            await session.close()
+
+
+async def get_read_db() -> AsyncSession:
+    user_id = current_user_id.get()
+    session_factory = ReadSessionLocal
+    if read_engine is engine or (user_id is not None and await _wrote_recently(user_id)):
+        session_factory = AsyncSessionLocal
+
+    async with session_factory() as session:
+        try:
+            yield session
         finally:
             await session.close()
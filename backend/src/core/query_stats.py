@@ -0,0 +1,146 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+import re
+import time
+
+from loguru import logger
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from .config import get_settings
+
+settings = get_settings()
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+# Placeholders are numbered and expanded IN lists render one per value;
+# normalise both so the same query with different ids counts as one shape.
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAM_LIST.sub("?, ...", _PARAM.sub("?", statement))
+
+
+class QueryStats:
+    __slots__ = ("label", "count", "total_time", "slowest_time", "slowest_statement", "shapes")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self) -> Dict[str, int]:
+        threshold = settings.sql_n_plus_one_threshold
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-DB-Query-Count": str(self.count),
+            "X-DB-Time-Ms": f"{self.total_time * 1000:.2f}",
+        }
+        if self.slowest_statement:
+            headers["X-DB-Slowest-Ms"] = f"{self.slowest_time * 1000:.2f}"
+            headers["X-DB-Slowest"] = _one_line(self.slowest_statement)
+        repeated = self.repeated()
+        if repeated:
+            headers["X-DB-N-Plus-One"] = str(max(repeated.values()))
+        return headers
+
+    def as_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "queries": self.count,
+            "db_ms": round(self.total_time * 1000, 2),
+            "slowest_ms": round(self.slowest_time * 1000, 2),
+            "slowest": _one_line(self.slowest_statement) if self.slowest_statement else None,
+            "n_plus_one": {_one_line(shape): n for shape, n in self.repeated().items()},
+        }
+
+
+def _one_line(statement: str, limit: int = 200) -> str:
+    return " ".join(statement.split())[:limit]
+
+
+def report(stats: QueryStats):
+    if not stats.count:
+        return
+
+    fields = stats.as_dict()
+    log = logger.bind(sql=fields)
+    if fields["n_plus_one"]:
+        log.warning(f"Possible N+1 in {stats.label}: {fields['n_plus_one']}")
+    elif fields["db_ms"] >= settings.sql_slow_request_ms:
+        log.warning(f"Slow database work in {stats.label}: {fields['queries']} queries, {fields['db_ms']} ms")
+    elif not settings.debug:
+        log.info(f"{stats.label}: {fields['queries']} queries, {fields['db_ms']} ms")
+
+
+@contextmanager
+def track_queries(label: str):
+    stats = QueryStats(label)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        report(stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started_at = getattr(context, "_query_started_at", None)
+    if stats is not None and started_at is not None:
+        stats.record(statement, time.perf_counter() - started_at)
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app, expose_headers: bool = False):
+        self.app = app
+        self.expose_headers = expose_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Dependencies run in this task, so the session teardown (and its
+        # COMMIT) is counted before the response headers go out.
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = _current_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and self.expose_headers:
+                MutableHeaders(scope=message).update(stats.headers())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            report(stats)
@@ -0,0 +1,19 @@
+from .config import get_settings
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        import redis.asyncio as aioredis
+
+        _client = aioredis.from_url(get_settings().redis_url, decode_responses=True)
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
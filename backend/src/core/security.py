@@ -1,8 +1,13 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
+import asyncio
+import hashlib
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from .cache import TTLCache
 from .config import get_settings
 
 settings = get_settings()
@@ -18,6 +23,85 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    def __init__(self, pool: str = "thread", workers: int = 4, max_pending: int = 64):
+        self.pool = pool
+        self.workers = workers
+        self._executor: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(max_pending)
+        self.calls = 0
+        self.in_flight = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.pool == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password"
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        # bcrypt is deliberately slow; keep it off the event loop so live
+        # WebSockets on this worker are not stalled by a burst of logins.
+        started = time.perf_counter()
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                result, run_seconds = await loop.run_in_executor(
+                    self._get_executor(), _timed, func, *args
+                )
+            finally:
+                self.in_flight -= 1
+
+        queue_seconds = time.perf_counter() - started - run_seconds
+        self.calls += 1
+        self.run_seconds += run_seconds
+        self.queue_seconds += queue_seconds
+        self.max_queue_seconds = max(self.max_queue_seconds, queue_seconds)
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "pool": self.pool,
+            "workers": self.workers,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "avg_queue_ms": self.queue_seconds / self.calls * 1000 if self.calls else 0.0,
+            "max_queue_ms": self.max_queue_seconds * 1000,
+            "avg_run_ms": self.run_seconds / self.calls * 1000 if self.calls else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(
+    pool=settings.password_hash_pool,
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -29,9 +113,38 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+# Verified claims keyed by token digest; each entry lives until the token's
+# own exp, so a cached token can never outlive its signature check.
+token_claims_cache = TTLCache(maxsize=settings.token_cache_size, ttl=0)
+_revocation_check: Optional[Callable[[dict], bool]] = None
+
+
+def set_revocation_check(check: Optional[Callable[[dict], bool]]):
+    global _revocation_check
+    _revocation_check = check
+
+
+def evict_token(token: str):
+    # Drops the cached claims only; the token itself stays valid until its
+    # exp unless the revocation check rejects it.
+    token_claims_cache.pop(hashlib.sha256(token.encode()).digest())
+
+
 def decode_access_token(token: str) -> Optional[dict]:
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
-        return payload
-    except JWTError:
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_claims_cache.get(digest)
+
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
+        except JWTError:
+            return None
+
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0 and settings.token_cache_size > 0:
+            token_claims_cache.set(digest, payload, ttl=ttl)
+
+    if _revocation_check is not None and _revocation_check(payload):
         return None
+    # Callers get their own copy so that none of them can alter the cached one.
+    return dict(payload)
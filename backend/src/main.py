@@ -1,10 +1,26 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from .core.config import get_settings
-from .api.v1 import auth, users, couples, messages, photos, diaries, todos
+from .api.v1 import auth, users, couples, messages, photos, upload_sessions, diaries, todos
 from .websocket import handler
+# Imported from the src root like the routers do, so these are the same
+# instances the routers and the websocket handler use.
+from core.redis import close_redis
+from core.security import password_hasher, token_claims_cache
+from core.query_stats import QueryStatsMiddleware
+from core.metrics import MetricsMiddleware, registry
+from services.content_store import storage_report
+from services.couple_graph import couple_graph_cache
+from services.message_writer import message_writer
+from services.principal_cache import principal_cache
+from services.read_receipts import read_receipts
+from services.renditions import rendition_pipeline
+from services.storage_service import close_storage_service
+from services.upload_sessions import upload_session_janitor
+from websocket.manager import manager
 
 settings = get_settings()
 
@@ -23,11 +39,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.sql_instrumentation:
+    app.add_middleware(QueryStatsMiddleware, expose_headers=settings.sql_stats_headers)
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
 app.include_router(couples.router, prefix="/api/v1")
 app.include_router(messages.router, prefix="/api/v1")
 app.include_router(photos.router, prefix="/api/v1")
+app.include_router(upload_sessions.router, prefix="/api/v1")
 app.include_router(diaries.router, prefix="/api/v1")
 app.include_router(todos.router, prefix="/api/v1")
 
@@ -37,11 +60,24 @@ app.include_router(handler.router, prefix="/ws")
 @app.on_event("startup")
 async def startup_event():
     logger.info("Couple Space API starting up...")
+    await manager.start()
+    await message_writer.start()
+    await read_receipts.start()
+    await rendition_pipeline.start()
+    await upload_session_janitor.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Couple Space API shutting down...")
+    await manager.stop()
+    await message_writer.stop()
+    await read_receipts.stop()
+    await rendition_pipeline.stop()
+    await upload_session_janitor.stop()
+    await close_redis()
+    await close_storage_service()
+    password_hasher.shutdown()
 
 
 @app.get("/")
@@ -49,6 +85,40 @@ async def root():
     return {"message": "Welcome to Couple Space API"}
 
 
+@app.get("/stats/cache")
+async def cache_stats():
+    return {
+        "principal": {
+            "hits": principal_cache.local.hits,
+            "misses": principal_cache.local.misses,
+            "size": len(principal_cache.local),
+        },
+        "couple_graph": couple_graph_cache.stats(),
+    }
+
+
+@app.get("/stats/auth")
+async def auth_stats():
+    return {
+        "password_hasher": password_hasher.stats(),
+        "token_cache": {
+            "hits": token_claims_cache.hits,
+            "misses": token_claims_cache.misses,
+            "size": len(token_claims_cache),
+        },
+    }
+
+
+@app.get("/stats/storage")
+async def storage_stats():
+    return await storage_report()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
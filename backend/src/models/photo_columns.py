@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+
+
+class PhotoMediaColumns:
+    # Mixed into Photo (class Photo(PhotoMediaColumns, Base)); mirrors the
+    # columns added by migrations c4f2a8e61d3b, f6c3e9a2b7d1 and a7d2c4e9f130.
+    status = Column(String(16), nullable=False, default="ready", server_default="ready")
+    preview_url = Column(String(500), nullable=True)
+    display_url = Column(String(500), nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    taken_at = Column(DateTime, nullable=True)
+    dominant_color = Column(String(7), nullable=True)
+    blurhash = Column(String(64), nullable=True)
+    render_claimed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, func
+
+from core.database import Base
+
+
+class StorageObject(Base):
+    __tablename__ = "storage_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    url = Column(String(500), nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,7 +1,25 @@
-from .user import UserCreate, UserLogin, UserResponse, UserUpdate, Token, TokenPayload
-from .couple import CoupleCreate, CoupleResponse, CoupleBind
-from .message import MessageCreate, MessageResponse, MessageSocket
-from .photo import PhotoCreate, PhotoResponse
+from .user import UserCreate, UserLogin, UserResponse, UserUpdate, Principal, Token, TokenPayload
+from .couple import CoupleCreate, CoupleResponse, CoupleBind, CoupleGraph
+from .message import (
+    MessageCreate,
+    MessageResponse,
+    MessagePage,
+    ReadStateResponse,
+    MarkRead,
+    MessageSocket,
+)
+from .photo import (
+    PhotoCreate,
+    PhotoResponse,
+    PhotoFromHash,
+    DirectUploadCreate,
+    DirectUploadResponse,
+    DirectUploadComplete,
+    PhotoPage,
+    PhotoBatchItem,
+    PhotoBatchResponse,
+)
+from .upload import UploadSessionCreate, UploadSessionResponse, UploadSessionComplete
 from .diary import DiaryCreate, DiaryUpdate, DiaryResponse
 from .todo import TodoCreate, TodoUpdate, TodoResponse
 
@@ -10,16 +28,31 @@ __all__ = [
     "UserLogin",
     "UserResponse",
     "UserUpdate",
+    "Principal",
     "Token",
     "TokenPayload",
     "CoupleCreate",
     "CoupleResponse",
     "CoupleBind",
+    "CoupleGraph",
     "MessageCreate",
     "MessageResponse",
+    "MessagePage",
+    "ReadStateResponse",
+    "MarkRead",
     "MessageSocket",
     "PhotoCreate",
     "PhotoResponse",
+    "PhotoFromHash",
+    "DirectUploadCreate",
+    "DirectUploadResponse",
+    "DirectUploadComplete",
+    "PhotoPage",
+    "PhotoBatchItem",
+    "PhotoBatchResponse",
+    "UploadSessionCreate",
+    "UploadSessionResponse",
+    "UploadSessionComplete",
     "DiaryCreate",
     "DiaryUpdate",
     "DiaryResponse",
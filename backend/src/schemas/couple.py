@@ -18,3 +18,15 @@ class CoupleResponse(BaseModel):
 
 class CoupleBind(BaseModel):
     invite_code: str
+
+
+class CoupleGraph(BaseModel):
+    couple_id: int
+    member_ids: list[int]
+    room_id: int | None = None
+
+    def partner_of(self, user_id: int) -> int | None:
+        for member_id in self.member_ids:
+            if member_id != user_id:
+                return member_id
+        return None
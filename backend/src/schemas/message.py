@@ -20,6 +20,22 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class MessagePage(BaseModel):
+    items: list[MessageResponse]
+    has_more: bool
+    next_cursor: str | None = None
+
+
+class ReadStateResponse(BaseModel):
+    room_id: int
+    last_read_message_id: int = 0
+    unread_count: int = 0
+
+
+class MarkRead(BaseModel):
+    message_id: int
+
+
 class MessageSocket(BaseModel):
     content: str
     message_type: str
@@ -6,14 +6,64 @@ class PhotoCreate(BaseModel):
     caption: str | None = None
 
 
+class PhotoFromHash(BaseModel):
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$")
+    filename: str = Field(..., min_length=1, max_length=255)
+    caption: str | None = None
+
+
+class DirectUploadCreate(BaseModel):
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$")
+    content_type: str | None = None
+    size: int = Field(..., gt=0)
+
+
+class DirectUploadResponse(BaseModel):
+    exists: bool = False
+    upload_url: str | None = None
+    headers: dict[str, str] = {}
+    expires_in: int | None = None
+
+
+class DirectUploadComplete(PhotoFromHash):
+    content_type: str | None = None
+
+
 class PhotoResponse(BaseModel):
     id: int
     filename: str
     url: str
     thumbnail_url: str | None = None
+    preview_url: str | None = None
+    display_url: str | None = None
+    status: str = "ready"
+    width: int | None = None
+    height: int | None = None
+    taken_at: datetime | None = None
+    dominant_color: str | None = None
+    blurhash: str | None = None
     caption: str | None = None
     user_id: int
     created_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class PhotoPage(BaseModel):
+    items: list[PhotoResponse]
+    has_more: bool
+    next_cursor: str | None = None
+
+
+class PhotoBatchItem(BaseModel):
+    filename: str | None = None
+    photo: PhotoResponse | None = None
+    deduplicated: bool = False
+    error: str | None = None
+
+
+class PhotoBatchResponse(BaseModel):
+    items: list[PhotoBatchItem]
+    succeeded: int
+    failed: int
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str | None = None
+    size: int = Field(..., gt=0)
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    content_type: str | None = None
+    size: int
+    chunk_size: int
+    total_chunks: int
+    received: list[int] = []
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class UploadSessionComplete(BaseModel):
+    caption: str | None = None
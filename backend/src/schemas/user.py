@@ -30,6 +30,20 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class Principal(BaseModel):
+    id: int
+    username: str
+    email: str
+    nickname: str
+    avatar_url: str | None = None
+    bio: str | None = None
+    couple_id: int | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class UserUpdate(BaseModel):
     nickname: str | None = None
     avatar_url: str | None = None
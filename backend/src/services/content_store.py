@@ -0,0 +1,182 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select, update, delete, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import AsyncSessionLocal
+from core.metrics import registry
+from models.storage_object import StorageObject
+from services.storage_service import StoredFile, get_storage_service
+
+dedup_hits = registry.counter(
+    "storage_dedup_total", "Uploads that matched an already stored object"
+)
+dedup_bytes = registry.counter(
+    "storage_dedup_bytes_total", "Bytes not written because the object already existed"
+)
+
+
+class ContentPurged(Exception):
+    pass
+
+
+def _group_by_count(urls: Iterable[str]) -> Dict[int, List[str]]:
+    # A photo can reference one object several times (a small image renders
+    # to identical thumbnail/preview/display bytes), so counts are per URL.
+    groups: Dict[int, List[str]] = defaultdict(list)
+    for url, n in Counter(u for u in urls if u).items():
+        groups[n].append(url)
+    return groups
+
+
+async def acquire(db: AsyncSession, stored_files: Iterable[StoredFile]) -> Set[str]:
+    counts: Dict[str, int] = Counter()
+    objects: Dict[str, StoredFile] = {}
+    for stored in stored_files:
+        counts[stored.sha256] += 1
+        objects[stored.sha256] = stored
+        if stored.deduplicated:
+            dedup_hits.inc()
+            dedup_bytes.inc(stored.size)
+
+    if not objects:
+        return set()
+
+    stmt = pg_insert(StorageObject).values([
+        {
+            "sha256": sha256,
+            "url": stored.url,
+            "size": stored.size,
+            "content_type": stored.content_type,
+            "ref_count": counts[sha256],
+        }
+        for sha256, stored in objects.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StorageObject.sha256],
+        set_={"ref_count": StorageObject.ref_count + stmt.excluded.ref_count},
+    ).returning(StorageObject.sha256, literal_column("xmax = 0"))
+    result = await db.execute(stmt)
+
+    # The upsert holds the row lock until commit, so purge() cannot remove
+    # the object any more. But an upload that deduplicated against a file
+    # purge() removed just before (the row was gone, so this inserted a new
+    # one) points at nothing; that has to be re-uploaded. Those rows are
+    # taken out again and their hashes returned, the rest keep their
+    # references.
+    storage = get_storage_service()
+    purged = set()
+    for sha256, inserted in result.all():
+        stored = objects[sha256]
+        if inserted and stored.deduplicated and await storage.stat_content(sha256) is None:
+            purged.add(sha256)
+    if purged:
+        await db.execute(delete(StorageObject).where(StorageObject.sha256.in_(purged)))
+    return purged
+
+
+async def lock_live_urls(db: AsyncSession, urls: Iterable[Optional[str]]) -> bool:
+    # Locks the rows of objects that are still referenced, so purge() cannot
+    # remove them before this transaction commits its own references.
+    urls = set(url for url in urls if url)
+    result = await db.execute(
+        select(StorageObject.url)
+        .where(StorageObject.url.in_(urls), StorageObject.ref_count > 0)
+        .with_for_update()
+    )
+    return set(result.scalars().all()) == urls
+
+
+async def acquire_urls(db: AsyncSession, urls: Iterable[Optional[str]]):
+    for n, group in _group_by_count(urls).items():
+        await db.execute(
+            update(StorageObject)
+            .where(StorageObject.url.in_(group))
+            .values(ref_count=StorageObject.ref_count + n)
+        )
+
+
+async def release(db: AsyncSession, urls: Iterable[Optional[str]]) -> List[str]:
+    # Rows that drop to zero are left for purge(), which removes the file and
+    # the row together under the row lock.
+    urls = [url for url in urls if url]
+    tracked = set()
+    orphaned = []
+    for n, group in _group_by_count(urls).items():
+        result = await db.execute(
+            update(StorageObject)
+            .where(StorageObject.url.in_(group))
+            .values(ref_count=StorageObject.ref_count - n)
+            .returning(StorageObject.url, StorageObject.ref_count)
+        )
+        for url, ref_count in result.all():
+            tracked.add(url)
+            if ref_count <= 0:
+                orphaned.append(url)
+
+    # Files stored before content addressing have no row and belong to a
+    # single photo, so they go with it.
+    legacy = [url for url in dict.fromkeys(urls) if url not in tracked]
+    return orphaned + legacy
+
+
+async def purge(urls: List[str]):
+    # Called after the releasing transaction commits. Each object is removed
+    # under its row lock, so it serializes with acquire(): an upload that
+    # re-referenced the object first keeps it, one that comes later finds it
+    # gone (see ContentPurged).
+    storage = get_storage_service()
+    for url in urls:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StorageObject).where(StorageObject.url == url).with_for_update()
+            )
+            obj = result.scalar_one_or_none()
+            if obj is not None and obj.ref_count > 0:
+                continue
+            await storage.delete_file(url)
+            if obj is not None:
+                await db.delete(obj)
+                await db.commit()
+
+
+async def discard(stored_files: Iterable[StoredFile]):
+    # For uploads whose references were never committed: an object this
+    # request wrote has no row, so nothing else would ever purge it.
+    urls = [stored.url for stored in stored_files if not stored.deduplicated]
+    try:
+        await purge(urls)
+    except Exception as e:
+        logger.error(f"Discarding {len(urls)} uncommitted objects failed: {e}")
+
+
+async def find_object(db: AsyncSession, sha256: str) -> Optional[StorageObject]:
+    result = await db.execute(
+        select(StorageObject).where(StorageObject.sha256 == sha256, StorageObject.ref_count > 0)
+    )
+    return result.scalar_one_or_none()
+
+
+async def storage_report() -> dict:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(StorageObject.size), 0),
+                func.coalesce(func.sum(StorageObject.ref_count), 0),
+                func.coalesce(func.sum(StorageObject.size * StorageObject.ref_count), 0),
+            ).where(StorageObject.ref_count > 0)
+        )
+        objects, stored_bytes, references, referenced_bytes = result.one()
+
+    return {
+        "objects": objects,
+        "references": int(references),
+        "stored_bytes": int(stored_bytes),
+        "referenced_bytes": int(referenced_bytes),
+        "bytes_saved": int(referenced_bytes - stored_bytes),
+        "dedup_ratio": round(referenced_bytes / stored_bytes, 3) if stored_bytes else 1.0,
+    }
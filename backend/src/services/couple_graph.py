@@ -0,0 +1,146 @@
+from typing import List, Tuple
+import time
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache import TTLCache
+from core.config import get_settings
+from core.metrics import registry
+from core.redis import get_redis
+from models import User, Room
+from schemas.couple import CoupleGraph
+from websocket.manager import manager
+
+settings = get_settings()
+
+couple_graph_lookups = registry.counter(
+    "couple_graph_lookups_total",
+    "Couple graph lookups by the tier that answered them",
+    ("source",),
+)
+couple_graph_lookup_duration = registry.histogram(
+    "couple_graph_lookup_duration_seconds",
+    "Time to resolve a couple's members and room",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+class CoupleGraphCache:
+    key_prefix = "couple_space:couple_graph:"
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, redis_ttl: int = 3600, use_redis: bool = True):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis_ttl = redis_ttl
+        self.use_redis = use_redis
+        # Two members per couple, aged out alongside the graphs they point at.
+        self._member_index = TTLCache(maxsize=maxsize * 2, ttl=ttl)
+        self.redis_hits = 0
+        self.db_loads = 0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.max_lookup_seconds = 0.0
+
+    def _key(self, couple_id: int) -> str:
+        return f"{self.key_prefix}{couple_id}"
+
+    async def get(self, db: AsyncSession, couple_id: int) -> CoupleGraph:
+        started = time.perf_counter()
+        graph, source = await self._get(db, couple_id)
+        elapsed = time.perf_counter() - started
+        self.lookups += 1
+        self.lookup_seconds += elapsed
+        self.max_lookup_seconds = max(self.max_lookup_seconds, elapsed)
+        couple_graph_lookups.inc(1, (source,))
+        couple_graph_lookup_duration.observe(elapsed)
+        return graph
+
+    async def _get(self, db: AsyncSession, couple_id: int) -> Tuple[CoupleGraph, str]:
+        graph = self.local.get(couple_id)
+        if graph is not None:
+            return graph, "local"
+
+        if self.use_redis:
+            try:
+                raw = await get_redis().get(self._key(couple_id))
+            except Exception as e:
+                logger.warning(f"Couple graph Redis read failed: {e}")
+                raw = None
+            if raw:
+                self.redis_hits += 1
+                graph = CoupleGraph.model_validate_json(raw)
+                self._remember(graph)
+                return graph, "redis"
+
+        members_result = await db.execute(
+            select(User.id).where(User.couple_id == couple_id).order_by(User.id)
+        )
+        room_result = await db.execute(
+            select(Room.id).where(Room.couple_id == couple_id)
+        )
+        graph = CoupleGraph(
+            couple_id=couple_id,
+            member_ids=list(members_result.scalars().all()),
+            room_id=room_result.scalar_one_or_none(),
+        )
+        self.db_loads += 1
+        self._remember(graph)
+        if self.use_redis:
+            try:
+                await get_redis().set(self._key(couple_id), graph.model_dump_json(), ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"Couple graph Redis write failed: {e}")
+        return graph, "db"
+
+    def _remember(self, graph: CoupleGraph):
+        self.local.set(graph.couple_id, graph)
+        for member_id in graph.member_ids:
+            self._member_index.set(member_id, graph.couple_id)
+
+    async def invalidate(self, couple_id: int):
+        self.local.pop(couple_id)
+        if self.use_redis:
+            try:
+                await get_redis().delete(self._key(couple_id))
+            except Exception as e:
+                logger.warning(f"Couple graph Redis delete failed: {e}")
+
+    def evict_members(self, user_ids: List[int]):
+        # Other nodes learn about membership changes through the user-id
+        # invalidation fan-out, so map those ids back to cached couples.
+        for user_id in user_ids:
+            couple_id = self._member_index.get(user_id)
+            if couple_id is not None:
+                self._member_index.pop(user_id)
+                self.local.pop(couple_id)
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "local_hits": self.local.hits,
+            "redis_hits": self.redis_hits,
+            "db_loads": self.db_loads,
+            "hit_rate": (self.lookups - self.db_loads) / self.lookups if self.lookups else 0.0,
+            "avg_lookup_ms": self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0,
+            "max_lookup_ms": self.max_lookup_seconds * 1000,
+            "cached_couples": len(self.local),
+        }
+
+
+couple_graph_cache = CoupleGraphCache(
+    maxsize=settings.couple_graph_cache_size,
+    ttl=settings.couple_graph_cache_ttl_seconds,
+    redis_ttl=settings.couple_graph_cache_redis_ttl_seconds,
+    use_redis=settings.couple_graph_cache_redis,
+)
+manager.add_invalidation_listener(couple_graph_cache.evict_members)
+
+registry.callback_gauge(
+    "couple_graph_cache_hit_ratio", "Share of couple graph lookups served without the database",
+    lambda: {(): couple_graph_cache.stats()["hit_rate"]},
+)
+registry.callback_gauge(
+    "couple_graph_cached_couples", "Couple graphs held in this worker's local cache",
+    lambda: {(): len(couple_graph_cache.local)},
+)
@@ -0,0 +1,34 @@
+from typing import Optional
+import json
+
+from core.config import get_settings
+from core.redis import get_redis
+
+settings = get_settings()
+
+KEY_PREFIX = "couple_space:direct_upload:"
+# Time left to call complete after the presigned URL itself has expired.
+COMPLETE_GRACE_SECONDS = 600
+
+
+def _key(user_id: int, sha256: str) -> str:
+    return f"{KEY_PREFIX}{user_id}:{sha256}"
+
+
+async def grant_direct_upload(user_id: int, sha256: str, size: int, content_type: Optional[str]):
+    # Completion is only accepted for a hash this user was issued a PUT for,
+    # with the size it declared.
+    await get_redis().set(
+        _key(user_id, sha256),
+        json.dumps({"size": size, "content_type": content_type}),
+        ex=settings.storage_presign_expires_seconds + COMPLETE_GRACE_SECONDS,
+    )
+
+
+async def get_direct_upload(user_id: int, sha256: str) -> Optional[dict]:
+    raw = await get_redis().get(_key(user_id, sha256))
+    return json.loads(raw) if raw else None
+
+
+async def revoke_direct_upload(user_id: int, sha256: str):
+    await get_redis().delete(_key(user_id, sha256))
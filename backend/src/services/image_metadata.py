@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+import math
+
+# Helpers for render_renditions. They take already opened Pillow images, so
+# Pillow is still only imported inside the worker processes.
+
+_EXIF_IFD = 0x8769
+_ORIENTATION = 0x0112
+_DATETIME = 0x0132
+_DATETIME_ORIGINAL = 0x9003
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+# Blurhash is computed from a tiny copy; 4x3 components is what the
+# reference implementation recommends and encodes to 28 characters.
+BLURHASH_SAMPLE = 32
+BLURHASH_COMPONENTS = (4, 3)
+
+
+def image_size(size: Tuple[int, int], exif) -> Tuple[int, int]:
+    # Size as displayed, i.e. after the EXIF rotation exif_transpose applies.
+    width, height = size
+    if exif.get(_ORIENTATION) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def taken_at(exif) -> Optional[datetime]:
+    # Camera local time; EXIF has no reliable zone, so it is stored naive.
+    value = exif.get_ifd(_EXIF_IFD).get(_DATETIME_ORIGINAL) or exif.get(_DATETIME)
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value.strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def dominant_color(image) -> str:
+    palette_image = image.resize((64, 64)).quantize(colors=5)
+    _, index = max(palette_image.getcolors())
+    r, g, b = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(max(value, 0.0), 1.0)
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(_BASE83[value // 83 ** (length - i - 1) % 83] for i in range(length))
+
+
+def _sign_pow(value: float, exponent: float) -> float:
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode_blurhash(
+    pixels: Sequence[Tuple[int, int, int]],
+    width: int,
+    height: int,
+    components: Tuple[int, int] = BLURHASH_COMPONENTS,
+) -> str:
+    x_components, y_components = components
+    linear = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors: List[Tuple[float, float, float]] = []
+    for j in range(y_components):
+        for i in range(x_components):
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83(x_components - 1 + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        maximum = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        result += _base83(0, 1)
+
+    r, g, b = (_linear_to_srgb(c) for c in dc)
+    result += _base83((r << 16) + (g << 8) + b, 4)
+
+    for factor in ac:
+        qr, qg, qb = (
+            max(0, min(18, int(math.floor(_sign_pow(c / maximum, 0.5) * 9 + 9.5))))
+            for c in factor
+        )
+        result += _base83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
+
+
+def blurhash(image) -> str:
+    sample = image.resize((BLURHASH_SAMPLE, BLURHASH_SAMPLE))
+    return encode_blurhash(list(sample.getdata()), BLURHASH_SAMPLE, BLURHASH_SAMPLE)
+
+
+def extract_metadata(size: Tuple[int, int], exif, image) -> dict:
+    # size: the stored size of the file as opened, before any draft()
+    # reduction; exif: its EXIF data; image: the decoded RGB image after
+    # rotation.
+    width, height = image_size(size, exif)
+    return {
+        "width": width,
+        "height": height,
+        "taken_at": taken_at(exif),
+        "dominant_color": dominant_color(image),
+        "blurhash": blurhash(image),
+    }
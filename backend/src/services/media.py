@@ -0,0 +1,170 @@
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
+import asyncio
+import os
+import re
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from core.config import get_settings
+
+settings = get_settings()
+
+_SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Content-addressed objects never change under the same URL.
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+# The content type is declared by the client, so only types the album can
+# display are kept; anything else (text/html, SVG, ...) is stored and served
+# as an opaque download rather than rendered on the app origin.
+INLINE_MEDIA_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/webp",
+    "image/heic",
+    "image/heif",
+    "image/avif",
+    "video/mp4",
+    "video/quicktime",
+    "video/webm",
+}
+OPAQUE_MEDIA_TYPE = "application/octet-stream"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def media_type(content_type: Optional[str]) -> str:
+    content_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return content_type if content_type in INLINE_MEDIA_TYPES else OPAQUE_MEDIA_TYPE
+
+
+def media_headers(content_type: str, cache_control: str) -> dict:
+    headers = {"Cache-Control": cache_control, "X-Content-Type-Options": "nosniff"}
+    if content_type not in INLINE_MEDIA_TYPES:
+        headers["Content-Disposition"] = "attachment"
+    return headers
+
+
+def content_etag(object_key: str) -> Optional[str]:
+    name = object_key.rsplit("/", 1)[-1]
+    if _SHA256_NAME.match(name):
+        return f'"{name}"'
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison.
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    # Single byte ranges only; anything else is ignored and the whole file
+    # is sent, which RFC 9110 allows.
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _read_at(f, offset: int, length: int) -> bytes:
+    f.seek(offset)
+    return f.read(length)
+
+
+async def iter_file(path: str, start: int, end: int, chunk_size: int = 256 * 1024) -> AsyncIterator[bytes]:
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        offset = start
+        while offset <= end:
+            data = await asyncio.to_thread(_read_at, f, offset, min(chunk_size, end - offset + 1))
+            if not data:
+                break
+            offset += len(data)
+            yield data
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def accel_response(
+    object_key: str, content_type: str, etag: Optional[str], cache_control: str
+) -> Response:
+    # nginx takes over from here: sendfile and Range. It does not pass ETag
+    # on by itself, so the location re-adds this one instead of its own
+    # mtime/size ETag, and clients revalidate against one validator.
+    headers = {
+        "X-Accel-Redirect": settings.media_accel_prefix + quote(object_key),
+        "Content-Type": content_type,
+        **media_headers(content_type, cache_control),
+    }
+    if etag:
+        headers["ETag"] = etag
+    return Response(headers=headers)
+
+
+async def file_response(
+    request: Request,
+    path: str,
+    content_type: str,
+    etag: Optional[str],
+    cache_control: str,
+) -> Response:
+    stat = await asyncio.to_thread(os.stat, path)
+    size = stat.st_size
+    if etag is None:
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", **media_headers(content_type, cache_control)}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(path, start, end),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers,
+    )
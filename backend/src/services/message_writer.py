@@ -0,0 +1,122 @@
+from collections import Counter
+from typing import List, Optional, Tuple
+import asyncio
+
+from loguru import logger
+from sqlalchemy import insert
+
+from core.config import get_settings
+from core.database import AsyncSessionLocal, mark_recent_writes
+from core.metrics import messages_persisted
+from models import Message
+from services.read_receipts import increment_unread
+
+settings = get_settings()
+
+
+class MessageWriter:
+    def __init__(self, session_factory=AsyncSessionLocal, max_batch_size: int = 200, max_delay: float = 0.005):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+
+    async def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        # Flush whatever was accepted before shutdown.
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await self._flush(batch)
+
+    async def write(self, values: dict):
+        if self._worker is None:
+            raise RuntimeError("Message writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((values, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[dict, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _insert(self, values: List[dict]) -> list:
+        # Rows are inserted in arrival order in one multi-row INSERT, so ids
+        # (and therefore per-room order) follow the order senders were queued.
+        async with self.session_factory() as db:
+            result = await db.execute(
+                insert(Message).returning(
+                    Message.id, Message.created_at, sort_by_parameter_order=True
+                ),
+                values,
+            )
+            rows = result.all()
+            await increment_unread(
+                db, Counter((v["receiver_id"], v["room_id"]) for v in values)
+            )
+            await db.commit()
+        # Both sides read the new rows (history, unread count) right after.
+        await mark_recent_writes(
+            user_id for v in values for user_id in (v["sender_id"], v["receiver_id"])
+        )
+        return rows
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        try:
+            rows = await self._insert([values for values, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad row fails the whole statement; retry the rows one at
+                # a time so that only its own sender sees the error.
+                logger.warning(f"Message batch of {len(batch)} failed, retrying row by row: {e}")
+                for item in batch:
+                    await self._flush([item])
+                return
+
+            logger.error(f"Message insert failed: {e}")
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(rows)
+        messages_persisted.inc(len(rows), ("websocket",))
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result(row)
+
+
+message_writer = MessageWriter(
+    max_batch_size=settings.message_batch_size,
+    max_delay=settings.message_batch_window_ms / 1000,
+)
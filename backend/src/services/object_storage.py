@@ -0,0 +1,311 @@
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, List, Optional
+import asyncio
+import base64
+import hashlib
+import os
+import tempfile
+import uuid
+
+from loguru import logger
+
+from services.storage_service import (
+    StorageService,
+    StoredFile,
+    UploadTooLarge,
+    content_filename,
+)
+
+
+class S3StorageService(StorageService):
+    def __init__(
+        self,
+        bucket: str,
+        region: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        addressing_style: str = "auto",
+        public_base_url: Optional[str] = None,
+        max_pool_connections: int = 50,
+        part_size: int = 8 * 1024 * 1024,
+        multipart_concurrency: int = 4,
+        presign_expires: int = 900,
+        checksum_uploads: bool = True,
+    ):
+        self.bucket = bucket
+        self.region = region
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.addressing_style = addressing_style
+        self.max_pool_connections = max_pool_connections
+        # S3 rejects multipart parts under 5 MiB (except the last one).
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.multipart_concurrency = multipart_concurrency
+        self.presign_expires = presign_expires
+        self.checksum_uploads = checksum_uploads
+
+        base = public_base_url or f"{endpoint_url or f'https://s3.{region}.amazonaws.com'}/{bucket}"
+        self.url_prefix = base.rstrip("/") + "/"
+
+        self._client = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+        self._client_lock = asyncio.Lock()
+
+    async def _get_client(self):
+        # One client per process: it owns the connection pool.
+        if self._client is not None:
+            return self._client
+
+        async with self._client_lock:
+            if self._client is None:
+                from aiobotocore.config import AioConfig
+                from aiobotocore.session import get_session
+
+                exit_stack = AsyncExitStack()
+                self._client = await exit_stack.enter_async_context(
+                    get_session().create_client(
+                        "s3",
+                        region_name=self.region,
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                        config=AioConfig(
+                            max_pool_connections=self.max_pool_connections,
+                            s3={"addressing_style": self.addressing_style},
+                        ),
+                    )
+                )
+                self._exit_stack = exit_stack
+        return self._client
+
+    async def close(self):
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._client = None
+        self._exit_stack = None
+
+    def key_from_url(self, file_url: str) -> str:
+        if file_url.startswith(self.url_prefix):
+            return file_url[len(self.url_prefix):]
+        return file_url
+
+    async def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        client = await self._get_client()
+        try:
+            return await client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    async def _exists(self, key: str) -> bool:
+        return await self._head(key) is not None
+
+    async def _upload_part(self, client, key: str, upload_id: str, number: int, data: bytes, slots: asyncio.Semaphore) -> dict:
+        try:
+            response = await client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data
+            )
+            return {"ETag": response["ETag"], "PartNumber": number}
+        finally:
+            slots.release()
+
+    async def _put_stream(
+        self,
+        key: str,
+        chunks: AsyncIterable[bytes],
+        content_type: Optional[str],
+        max_size: Optional[int],
+        digest,
+    ) -> int:
+        client = await self._get_client()
+        extra = {"ContentType": content_type} if content_type else {}
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts: List[asyncio.Task] = []
+        # Bounds memory to multipart_concurrency parts in flight plus one
+        # being filled, whatever the object size.
+        slots = asyncio.Semaphore(self.multipart_concurrency)
+
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(key)
+                await asyncio.to_thread(digest.update, chunk)
+                buffer += chunk
+
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        response = await client.create_multipart_upload(
+                            Bucket=self.bucket, Key=key, **extra
+                        )
+                        upload_id = response["UploadId"]
+                    data = bytes(buffer[:self.part_size])
+                    del buffer[:self.part_size]
+                    await slots.acquire()
+                    parts.append(asyncio.create_task(
+                        self._upload_part(client, key, upload_id, len(parts) + 1, data, slots)
+                    ))
+
+            if upload_id is None:
+                await client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra)
+                return size
+
+            if buffer:
+                await slots.acquire()
+                parts.append(asyncio.create_task(
+                    self._upload_part(client, key, upload_id, len(parts) + 1, bytes(buffer), slots)
+                ))
+            completed = await asyncio.gather(*parts)
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": list(completed)},
+            )
+            return size
+        except BaseException:
+            for task in parts:
+                task.cancel()
+            if upload_id is not None:
+                try:
+                    await client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+                except Exception as e:
+                    logger.warning(f"Aborting multipart upload {upload_id} failed: {e}")
+            raise
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        filename: str,
+        content_type: str,
+        max_size: Optional[int] = None,
+    ) -> StoredFile:
+        digest = hashlib.sha256()
+        size = await self._put_stream(filename, chunks, content_type, max_size, digest)
+        return StoredFile(self.url_prefix + filename, filename, size, digest.hexdigest(), content_type)
+
+    async def upload_content(
+        self,
+        chunks: AsyncIterable[bytes],
+        content_type: str,
+        max_size: Optional[int] = None,
+    ) -> StoredFile:
+        # Objects that fit in one part are hashed before anything is sent, so
+        # a duplicate costs a HEAD instead of an upload.
+        iterator = chunks.__aiter__()
+        head = bytearray()
+        exhausted = False
+        while len(head) < self.part_size:
+            try:
+                head += await iterator.__anext__()
+            except StopAsyncIteration:
+                exhausted = True
+                break
+            if max_size is not None and len(head) > max_size:
+                raise UploadTooLarge("content")
+
+        if exhausted:
+            sha256 = (await asyncio.to_thread(hashlib.sha256, bytes(head))).hexdigest()
+            filename = content_filename(sha256)
+            deduplicated = await self._exists(filename)
+            if not deduplicated:
+                client = await self._get_client()
+                extra = {"ContentType": content_type} if content_type else {}
+                await client.put_object(Bucket=self.bucket, Key=filename, Body=bytes(head), **extra)
+            return StoredFile(self.url_prefix + filename, filename, len(head), sha256, content_type, deduplicated)
+
+        async def replay() -> AsyncIterator[bytes]:
+            yield bytes(head)
+            async for chunk in iterator:
+                yield chunk
+
+        # Larger objects are staged under a temporary key and copied to their
+        # content key once the hash is known.
+        staging_key = f"tmp/{uuid.uuid4().hex}"
+        digest = hashlib.sha256()
+        size = await self._put_stream(staging_key, replay(), content_type, max_size, digest)
+        sha256 = digest.hexdigest()
+        filename = content_filename(sha256)
+
+        client = await self._get_client()
+        try:
+            deduplicated = await self._exists(filename)
+            if not deduplicated:
+                await client.copy_object(
+                    Bucket=self.bucket,
+                    Key=filename,
+                    CopySource={"Bucket": self.bucket, "Key": staging_key},
+                )
+        finally:
+            await client.delete_object(Bucket=self.bucket, Key=staging_key)
+
+        return StoredFile(self.url_prefix + filename, filename, size, sha256, content_type, deduplicated)
+
+    async def delete_file(self, file_url: str) -> bool:
+        client = await self._get_client()
+        await client.delete_object(Bucket=self.bucket, Key=self.key_from_url(file_url))
+        return True
+
+    async def get_file_url(self, filename: str) -> str:
+        return self.url_prefix + filename
+
+    @asynccontextmanager
+    async def local_copy(self, file_url: str):
+        client = await self._get_client()
+        fd, path = tempfile.mkstemp(prefix="couple_space_")
+        try:
+            response = await client.get_object(Bucket=self.bucket, Key=self.key_from_url(file_url))
+            with os.fdopen(fd, "wb") as f:
+                async with response["Body"] as body:
+                    while True:
+                        data = await body.read(1024 * 1024)
+                        if not data:
+                            break
+                        await asyncio.to_thread(f.write, data)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def presigned_get_url(self, file_url: str, content_type: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self.key_from_url(file_url)}
+        if content_type:
+            # Overrides the type the object was uploaded with.
+            params["ResponseContentType"] = content_type
+            if content_type == "application/octet-stream":
+                params["ResponseContentDisposition"] = "attachment"
+        client = await self._get_client()
+        return await client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=self.presign_expires
+        )
+
+    async def presigned_put(self, sha256: str, content_type: Optional[str]) -> Optional[dict]:
+        if not self.checksum_uploads:
+            return None
+
+        # The checksum is part of the signature, so the object stored under a
+        # content key is verified by the storage service to match that key.
+        filename = content_filename(sha256)
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        params = {"Bucket": self.bucket, "Key": filename, "ChecksumSHA256": checksum}
+        headers = {"x-amz-checksum-sha256": checksum}
+        if content_type:
+            params["ContentType"] = content_type
+            headers["Content-Type"] = content_type
+
+        client = await self._get_client()
+        url = await client.generate_presigned_url(
+            "put_object", Params=params, ExpiresIn=self.presign_expires
+        )
+        return {"url": url, "headers": headers, "expires_in": self.presign_expires}
+
+    async def stat_content(self, sha256: str) -> Optional[int]:
+        response = await self._head(content_filename(sha256))
+        return response["ContentLength"] if response else None
@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Photo
+from services.content_store import acquire, discard
+from services.media import media_type
+from services.renditions import rendition_pipeline, reuse_renditions, PHOTO_PROCESSING, PHOTO_READY
+from services.storage_service import StoredFile
+
+
+async def add_photos(
+    db: AsyncSession,
+    uploads: Sequence[Tuple[StoredFile, str, Optional[str]]],
+    user_id: int,
+) -> List[Optional[Photo]]:
+    for stored, _, _ in uploads:
+        stored.content_type = media_type(stored.content_type)
+
+    # All references are taken in one statement, whatever the batch size.
+    purged = await acquire(db, [stored for stored, _, _ in uploads])
+
+    # None for uploads that deduplicated against an object a concurrent
+    # delete removed; the bytes are gone, so the client has to send them again.
+    photos = []
+    now = datetime.utcnow()
+    for stored, filename, caption in uploads:
+        if stored.sha256 in purged:
+            photos.append(None)
+            continue
+        is_image = (stored.content_type or "").startswith("image/")
+        # Claimed for this worker's pipeline from the start, so that another
+        # worker resuming unfinished photos leaves it alone.
+        photo = Photo(
+            filename=filename,
+            url=stored.url,
+            caption=caption,
+            user_id=user_id,
+            status=PHOTO_PROCESSING if is_image else PHOTO_READY,
+            render_claimed_at=now if is_image else None,
+        )
+        if is_image and stored.deduplicated:
+            await reuse_renditions(db, photo)
+        photos.append(photo)
+
+    db.add_all([photo for photo in photos if photo is not None])
+    return photos
+
+
+async def add_photo(
+    db: AsyncSession,
+    stored: StoredFile,
+    filename: str,
+    caption: Optional[str],
+    user_id: int,
+) -> Photo:
+    photo = (await add_photos(db, [(stored, filename, caption)], user_id))[0]
+    if photo is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="文件已被删除，请重新上传"
+        )
+    return photo
+
+
+async def commit_photos(
+    db: AsyncSession,
+    uploads: Sequence[Tuple[StoredFile, str, Optional[str]]],
+    user_id: int,
+) -> List[Tuple[Optional[Photo], Optional[str]]]:
+    # One transaction for the whole batch. If it fails, each upload is
+    # retried in its own so that only the bad one reports an error.
+    if len(uploads) > 1:
+        try:
+            photos = await add_photos(db, uploads, user_id)
+            await db.commit()
+            return [(photo, None if photo else "文件已被删除，请重新上传") for photo in photos]
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Photo batch of {len(uploads)} failed, saving one by one: {e}")
+
+    outcomes = []
+    failed = []
+    for upload in uploads:
+        try:
+            photo = (await add_photos(db, [upload], user_id))[0]
+            await db.commit()
+            outcomes.append((photo, None if photo else "文件已被删除，请重新上传"))
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Saving photo {upload[1]} failed: {e}")
+            failed.append(upload[0])
+            outcomes.append((None, "保存失败"))
+
+    # Only once the others have committed their references: an object they
+    # share with a failed upload is kept.
+    await discard(failed)
+    return outcomes
+
+
+def schedule_renditions(photos: Iterable[Photo]):
+    # Only after commit: the pipeline reads the row from its own session.
+    for photo in photos:
+        if photo.status == PHOTO_PROCESSING:
+            rendition_pipeline.submit(photo.id, photo.url, photo.render_claimed_at)
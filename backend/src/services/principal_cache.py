@@ -0,0 +1,81 @@
+from typing import Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache import TTLCache
+from core.config import get_settings
+from core.redis import get_redis
+from models import User
+from schemas.user import Principal
+from websocket.manager import manager
+
+settings = get_settings()
+
+
+class PrincipalCache:
+    key_prefix = "couple_space:principal:"
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0, redis_ttl: int = 300, use_redis: bool = False):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis_ttl = redis_ttl
+        self.use_redis = use_redis
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[Principal]:
+        principal = self.local.get(user_id)
+        if principal is not None:
+            return principal
+
+        if self.use_redis:
+            try:
+                raw = await get_redis().get(self._key(user_id))
+            except Exception as e:
+                logger.warning(f"Principal cache Redis read failed: {e}")
+                raw = None
+            if raw:
+                principal = Principal.model_validate_json(raw)
+                self.local.set(user_id, principal)
+                return principal
+
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        if user is None:
+            return None
+
+        principal = Principal.model_validate(user)
+        self.local.set(user_id, principal)
+        if self.use_redis:
+            try:
+                await get_redis().set(self._key(user_id), principal.model_dump_json(), ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"Principal cache Redis write failed: {e}")
+        return principal
+
+    async def invalidate(self, user_ids: Iterable[int]):
+        user_ids = list(user_ids)
+        self.evict_local(user_ids)
+        if self.use_redis and user_ids:
+            try:
+                await get_redis().delete(*(self._key(i) for i in user_ids))
+            except Exception as e:
+                logger.warning(f"Principal cache Redis delete failed: {e}")
+        # Fans out to every node: evicts their local tier and marks live
+        # WebSocket contexts for these users stale.
+        await manager.invalidate_contexts(user_ids)
+
+    def evict_local(self, user_ids: List[int]):
+        for user_id in user_ids:
+            self.local.pop(user_id)
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl_seconds,
+    redis_ttl=settings.principal_cache_redis_ttl_seconds,
+    use_redis=settings.principal_cache_redis,
+)
+manager.add_invalidation_listener(principal_cache.evict_local)
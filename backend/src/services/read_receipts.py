@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+
+from loguru import logger
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from core.database import AsyncSessionLocal, mark_recent_writes
+from models import Message
+from models.read_state import RoomReadState
+from websocket.manager import manager
+
+settings = get_settings()
+
+
+async def increment_unread(db: AsyncSession, counts: Dict[Tuple[int, int], int]):
+    for (user_id, room_id), count in counts.items():
+        stmt = pg_insert(RoomReadState).values(
+            user_id=user_id, room_id=room_id, last_read_message_id=0, unread_count=count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RoomReadState.user_id, RoomReadState.room_id],
+            set_={"unread_count": RoomReadState.unread_count + stmt.excluded.unread_count},
+        )
+        await db.execute(stmt)
+
+
+async def apply_watermarks(
+    db: AsyncSession, marks: Dict[Tuple[int, int], int]
+) -> List[RoomReadState]:
+    states = []
+    for (user_id, room_id), message_id in marks.items():
+        # The id comes from the client; clamp it to the room's newest message
+        # so that a watermark can never be set past messages not yet sent.
+        newest = (
+            select(func.coalesce(func.max(Message.id), 0))
+            .where(Message.room_id == room_id)
+            .scalar_subquery()
+        )
+        stmt = pg_insert(RoomReadState).values(
+            user_id=user_id,
+            room_id=room_id,
+            last_read_message_id=func.least(message_id, newest),
+            unread_count=0,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RoomReadState.user_id, RoomReadState.room_id],
+            set_={
+                # Clamped again so that a watermark stored before the clamp
+                # existed comes back down as well.
+                "last_read_message_id": func.least(
+                    func.greatest(
+                        RoomReadState.last_read_message_id, stmt.excluded.last_read_message_id
+                    ),
+                    newest,
+                )
+            },
+        )
+        await db.execute(stmt)
+
+        # Re-derive the counter from the watermark; only the unread tail of the
+        # room is scanned, and this also heals any drift.
+        unread = (
+            select(func.count(Message.id))
+            .where(
+                Message.room_id == room_id,
+                Message.receiver_id == user_id,
+                Message.id > RoomReadState.last_read_message_id,
+            )
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(RoomReadState)
+            .where(RoomReadState.user_id == user_id, RoomReadState.room_id == room_id)
+            .values(unread_count=unread)
+            .returning(RoomReadState)
+        )
+        states.append(result.scalar_one())
+    return states
+
+
+async def get_read_state(db: AsyncSession, user_id: int, room_id: int) -> Optional[RoomReadState]:
+    result = await db.execute(
+        select(RoomReadState).where(
+            RoomReadState.user_id == user_id, RoomReadState.room_id == room_id
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+def unread_payload(room_id: int, state: Optional[RoomReadState]) -> dict:
+    return {
+        "type": "unread_count",
+        "room_id": room_id,
+        "last_read_message_id": state.last_read_message_id if state else 0,
+        "unread_count": state.unread_count if state else 0,
+    }
+
+
+class ReadReceiptBuffer:
+    def __init__(self, session_factory=AsyncSessionLocal, flush_interval: float = 1.0):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[int, int], int] = {}
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await self.flush()
+
+    def mark_read(self, user_id: int, room_id: int, message_id: int):
+        key = (user_id, room_id)
+        if message_id > self._pending.get(key, 0):
+            self._pending[key] = message_id
+
+    async def flush(self):
+        if not self._pending:
+            return
+        marks, self._pending = self._pending, {}
+        try:
+            async with self.session_factory() as db:
+                states = await apply_watermarks(db, marks)
+                await db.commit()
+            await mark_recent_writes(user_id for user_id, _ in marks)
+        except Exception as e:
+            logger.error(f"Read receipt flush of {len(marks)} watermarks failed: {e}")
+            for key, message_id in marks.items():
+                if message_id > self._pending.get(key, 0):
+                    self._pending[key] = message_id
+            return
+
+        for state in states:
+            await manager.send_personal(unread_payload(state.room_id, state), state.user_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+read_receipts = ReadReceiptBuffer(flush_interval=settings.read_receipt_flush_ms / 1000)
@@ -0,0 +1,277 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import io
+import time
+
+from loguru import logger
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_settings
+from core.database import AsyncSessionLocal
+from core.metrics import registry
+from models import Photo
+from services.content_store import acquire, acquire_urls, lock_live_urls, purge, discard, ContentPurged
+from services.image_metadata import extract_metadata
+from services.storage_service import get_storage_service, single_chunk
+
+settings = get_settings()
+
+PHOTO_PROCESSING = "processing"
+PHOTO_READY = "ready"
+PHOTO_FAILED = "failed"
+
+# (kind, longest edge in px), largest first so each step downsamples the last.
+RENDITIONS: Tuple[Tuple[str, int], ...] = (
+    ("display", 2048),
+    ("preview", 1024),
+    ("thumbnail", 320),
+)
+RENDITION_COLUMNS = {
+    "display": "display_url",
+    "preview": "preview_url",
+    "thumbnail": "thumbnail_url",
+}
+METADATA_COLUMNS = ("width", "height", "taken_at", "dominant_color", "blurhash")
+
+renditions_processed = registry.counter(
+    "photo_renditions_total", "Photos run through the rendition pipeline", ("status",)
+)
+render_duration = registry.histogram(
+    "photo_render_duration_seconds",
+    "Time to decode and resize one photo into all renditions and metadata",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def render_renditions(
+    source_path: str,
+    renditions: Sequence[Tuple[str, int]] = RENDITIONS,
+    quality: int = 82,
+) -> Tuple[Dict[str, bytes], dict]:
+    # Runs in a worker process; Pillow is only imported there.
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as source:
+        exif = source.getexif()
+        # draft() below changes source.size to the reduced decode size.
+        original_size = source.size
+        # JPEGs can be decoded straight at a reduced scale, which is most of
+        # the win for large camera photos.
+        largest = renditions[0][1]
+        source.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(source).convert("RGB")
+        # The image is already decoded here, so the metadata the album grid
+        # needs comes almost for free.
+        metadata = extract_metadata(original_size, exif, image)
+
+    output = {}
+    for kind, edge in renditions:
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+        output[kind] = buffer.getvalue()
+    return output, metadata
+
+
+class RenditionPipeline:
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 1000,
+        quality: int = 82,
+        claim_seconds: int = 900,
+    ):
+        self.workers = workers
+        self.quality = quality
+        self.claim_seconds = claim_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+        await self.resume()
+
+    async def resume(self) -> int:
+        # Photos left half-processed by a worker that went away are picked up
+        # again. Every uvicorn worker runs this on startup, so rows are claimed
+        # atomically and photos a live worker claimed recently are left alone.
+        capacity = self._queue.maxsize - self._queue.qsize()
+        if capacity <= 0:
+            return 0
+
+        now = datetime.utcnow()
+        claimable = (
+            select(Photo.id)
+            .where(
+                Photo.status == PHOTO_PROCESSING,
+                or_(
+                    Photo.render_claimed_at.is_(None),
+                    Photo.render_claimed_at < now - timedelta(seconds=self.claim_seconds),
+                ),
+            )
+            .order_by(Photo.id)
+            .limit(capacity)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Photo)
+                .where(Photo.id.in_(claimable))
+                .values(render_claimed_at=now)
+                .returning(Photo.id, Photo.url)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = result.all()
+            await db.commit()
+
+        for photo_id, url in claimed:
+            self.submit(photo_id, url, now)
+        return len(claimed)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, photo_id: int, url: str, claimed_at: datetime) -> bool:
+        try:
+            self._queue.put_nowait((photo_id, url, claimed_at))
+            return True
+        except asyncio.QueueFull:
+            # The row stays "processing" and is picked up by a worker that
+            # starts once the claim has expired.
+            logger.warning(f"Rendition queue full, deferring photo {photo_id}")
+            return False
+
+    async def _renew_claim(self, photo_id: int, claimed_at: datetime) -> bool:
+        # Renewed just before rendering. If the claim changed hands while the
+        # photo sat in the queue, the other worker renders it instead.
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Photo)
+                .where(
+                    Photo.id == photo_id,
+                    Photo.status == PHOTO_PROCESSING,
+                    Photo.render_claimed_at == claimed_at,
+                )
+                .values(render_claimed_at=datetime.utcnow())
+            )
+            await db.commit()
+            return result.rowcount > 0
+
+    async def _run(self):
+        while True:
+            photo_id, url, claimed_at = await self._queue.get()
+            try:
+                if not await self._renew_claim(photo_id, claimed_at):
+                    continue
+                await self._process(photo_id, url)
+                renditions_processed.inc(1, (PHOTO_READY,))
+            except Exception as e:
+                logger.error(f"Rendering photo {photo_id} failed: {e}")
+                renditions_processed.inc(1, (PHOTO_FAILED,))
+                try:
+                    await self._update(photo_id, {"status": PHOTO_FAILED})
+                except Exception as e:
+                    logger.error(f"Marking photo {photo_id} as failed failed: {e}")
+
+    async def _process(self, photo_id: int, url: str):
+        storage = get_storage_service()
+        loop = asyncio.get_running_loop()
+
+        started = time.perf_counter()
+        async with storage.local_copy(url) as path:
+            images, metadata = await loop.run_in_executor(
+                self._executor, render_renditions, path, RENDITIONS, self.quality
+            )
+        render_duration.observe(time.perf_counter() - started)
+
+        for attempt in range(3):
+            values = {"status": PHOTO_READY, **metadata}
+            stored_files = []
+            for kind, data in images.items():
+                stored = await storage.upload_content(single_chunk(data), "image/jpeg")
+                values[RENDITION_COLUMNS[kind]] = stored.url
+                stored_files.append(stored)
+
+            try:
+                updated = await self._update(photo_id, values, stored_files)
+                break
+            except ContentPurged:
+                # A rendition matched an object that was purged before it
+                # could be referenced; storing the bytes again restores it.
+                if attempt < 2:
+                    continue
+                await discard(stored_files)
+                raise
+            except Exception:
+                await discard(stored_files)
+                raise
+
+        if not updated:
+            # The photo was deleted while it was being rendered; keep only
+            # objects something else still references.
+            await purge([stored.url for stored in stored_files])
+
+    async def _update(self, photo_id: int, values: dict, stored_files=()) -> bool:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(update(Photo).where(Photo.id == photo_id).values(**values))
+            if result.rowcount == 0:
+                return False
+            if await acquire(db, stored_files):
+                raise ContentPurged(photo_id)
+            await db.commit()
+            return True
+
+
+async def reuse_renditions(db: AsyncSession, photo: Photo) -> bool:
+    # A deduplicated upload can borrow the renditions of any ready photo
+    # with the same original instead of rendering them again.
+    result = await db.execute(
+        select(Photo)
+        .where(Photo.url == photo.url, Photo.status == PHOTO_READY, Photo.thumbnail_url.isnot(None))
+        .limit(1)
+    )
+    source = result.scalar_one_or_none()
+    if source is None:
+        return False
+
+    urls = [getattr(source, column) for column in RENDITION_COLUMNS.values()]
+    if not await lock_live_urls(db, urls):
+        # The source is being deleted and its renditions purged.
+        return False
+
+    for column in (*RENDITION_COLUMNS.values(), *METADATA_COLUMNS):
+        setattr(photo, column, getattr(source, column))
+    photo.status = PHOTO_READY
+    await acquire_urls(db, urls)
+    return True
+
+
+rendition_pipeline = RenditionPipeline(
+    workers=settings.rendition_workers,
+    max_pending=settings.rendition_max_pending,
+    quality=settings.rendition_quality,
+    claim_seconds=settings.rendition_claim_seconds,
+)
+
+registry.callback_gauge(
+    "photo_rendition_queue_depth", "Photos waiting for renditions",
+    lambda: {(): rendition_pipeline.depth},
+)
@@ -1,12 +1,85 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterable, AsyncIterator, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import uuid
+
+from fastapi import UploadFile
+
+from core.config import get_settings
+
+settings = get_settings()
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class StoredFile:
+    __slots__ = ("url", "filename", "size", "sha256", "content_type", "deduplicated")
+
+    def __init__(
+        self,
+        url: str,
+        filename: str,
+        size: int,
+        sha256: str,
+        content_type: Optional[str] = None,
+        deduplicated: bool = False,
+    ):
+        self.url = url
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+        self.deduplicated = deduplicated
+
+
+async def iter_upload(file: UploadFile, chunk_size: int = None) -> AsyncIterator[bytes]:
+    chunk_size = chunk_size or settings.upload_chunk_size
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def single_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+def content_filename(sha256: str) -> str:
+    return f"objects/{sha256[:2]}/{sha256}"
 
 
 class StorageService(ABC):
     @abstractmethod
-    async def upload_file(self, file_data: bytes, filename: str, content_type: str) -> str:
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        filename: str,
+        content_type: str,
+        max_size: Optional[int] = None,
+    ) -> StoredFile:
         pass
 
+    @abstractmethod
+    async def upload_content(
+        self,
+        chunks: AsyncIterable[bytes],
+        content_type: str,
+        max_size: Optional[int] = None,
+    ) -> StoredFile:
+        # Stores the object under content_filename(sha256). If that object
+        # already exists nothing new is kept and deduplicated is set.
+        pass
+
+    async def upload_file(self, file_data: bytes, filename: str, content_type: str) -> str:
+        stored = await self.upload_stream(single_chunk(file_data), filename, content_type)
+        return stored.url
+
     @abstractmethod
     async def delete_file(self, file_url: str) -> bool:
         pass
@@ -15,31 +88,196 @@ class StorageService(ABC):
     async def get_file_url(self, filename: str) -> str:
         pass
 
+    @abstractmethod
+    def local_copy(self, file_url: str) -> AsyncContextManager[str]:
+        pass
+
+    def object_key(self, file_url: str) -> Optional[str]:
+        # Key of the object inside the local upload directory, for backends
+        # whose files nginx can serve directly; None otherwise.
+        return None
+
+    async def presigned_get_url(self, file_url: str, content_type: Optional[str] = None) -> Optional[str]:
+        return None
+
+    async def presigned_put(self, sha256: str, content_type: Optional[str]) -> Optional[dict]:
+        # Direct-to-storage upload of a content object; None if unsupported.
+        return None
+
+    async def stat_content(self, sha256: str) -> Optional[int]:
+        return None
+
+    async def close(self):
+        pass
+
+
+def _write_chunk(f, digest, chunk: bytes):
+    # hashlib releases the GIL on large buffers, so hashing rides along with
+    # the write in the worker thread instead of running on the event loop.
+    digest.update(chunk)
+    f.write(chunk)
+
+
+def _discard(f, path: str):
+    f.close()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _promote(part_path: str, object_path: str) -> bool:
+    # Same content, same object: an existing copy is kept and the new bytes
+    # are dropped without being moved into place.
+    if os.path.exists(object_path):
+        os.remove(part_path)
+        return True
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    os.replace(part_path, object_path)
+    return False
+
 
 class LocalStorageService(StorageService):
     def __init__(self, base_path: str = "uploads/"):
         self.base_path = base_path
-        import os
         os.makedirs(base_path, exist_ok=True)
 
-    async def upload_file(self, file_data: bytes, filename: str, content_type: str) -> str:
-        import os
+    async def _write_part(
+        self, chunks: AsyncIterable[bytes], part_path: str, max_size: Optional[int]
+    ) -> Tuple[int, str]:
+        digest = hashlib.sha256()
+        size = 0
+
+        f = await asyncio.to_thread(open, part_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(part_path)
+                await asyncio.to_thread(_write_chunk, f, digest, chunk)
+            await asyncio.to_thread(f.close)
+        except BaseException:
+            await asyncio.to_thread(_discard, f, part_path)
+            raise
+
+        return size, digest.hexdigest()
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        filename: str,
+        content_type: str,
+        max_size: Optional[int] = None,
+    ) -> StoredFile:
         file_path = os.path.join(self.base_path, filename)
-        with open(file_path, "wb") as f:
-            f.write(file_data)
-        return f"/uploads/{filename}"
+        part_path = f"{file_path}.part"
+        size, sha256 = await self._write_part(chunks, part_path, max_size)
+        await asyncio.to_thread(os.replace, part_path, file_path)
+
+        return StoredFile(f"/uploads/{filename}", filename, size, sha256, content_type)
+
+    async def upload_content(
+        self,
+        chunks: AsyncIterable[bytes],
+        content_type: str,
+        max_size: Optional[int] = None,
+    ) -> StoredFile:
+        part_path = os.path.join(self.base_path, f"{uuid.uuid4().hex}.part")
+        size, sha256 = await self._write_part(chunks, part_path, max_size)
+
+        filename = content_filename(sha256)
+        deduplicated = await asyncio.to_thread(_promote, part_path, os.path.join(self.base_path, filename))
+
+        return StoredFile(f"/uploads/{filename}", filename, size, sha256, content_type, deduplicated)
+
+    def object_key(self, file_url: str) -> Optional[str]:
+        if not file_url.startswith("/uploads/"):
+            return None
+        return file_url[len("/uploads/"):]
 
     async def delete_file(self, file_url: str) -> bool:
-        import os
         file_path = file_url.replace("/uploads/", self.base_path)
         if os.path.exists(file_path):
-            os.remove(file_path)
+            await asyncio.to_thread(os.remove, file_path)
             return True
         return False
 
     async def get_file_url(self, filename: str) -> str:
         return f"/uploads/{filename}"
 
+    @asynccontextmanager
+    async def local_copy(self, file_url: str):
+        yield file_url.replace("/uploads/", self.base_path)
+
+    async def stat_content(self, sha256: str) -> Optional[int]:
+        try:
+            stat = await asyncio.to_thread(os.stat, os.path.join(self.base_path, content_filename(sha256)))
+        except FileNotFoundError:
+            return None
+        return stat.st_size
+
+
+def create_storage_service() -> StorageService:
+    backend = settings.storage_backend
+    if backend == "local":
+        return LocalStorageService(settings.upload_dir)
+
+    from services.object_storage import S3StorageService
+
+    options = dict(
+        public_base_url=settings.storage_public_base_url,
+        max_pool_connections=settings.storage_max_pool_connections,
+        part_size=settings.storage_multipart_part_size,
+        multipart_concurrency=settings.storage_multipart_concurrency,
+        presign_expires=settings.storage_presign_expires_seconds,
+    )
+    if backend == "s3":
+        return S3StorageService(
+            settings.aws_bucket_name,
+            region=settings.aws_region,
+            endpoint_url=settings.s3_endpoint_url,
+            access_key=settings.aws_access_key_id,
+            secret_key=settings.aws_secret_access_key,
+            addressing_style="path" if settings.s3_endpoint_url else "auto",
+            **options,
+        )
+    # OSS and COS are driven through their S3-compatible APIs; neither
+    # enforces x-amz-checksum-sha256, so direct uploads stay off for them.
+    if backend == "oss":
+        return S3StorageService(
+            settings.oss_bucket_name,
+            region=settings.oss_endpoint.split(".", 1)[0],
+            endpoint_url=f"https://{settings.oss_endpoint}",
+            access_key=settings.oss_access_key_id,
+            secret_key=settings.oss_access_key_secret,
+            addressing_style="virtual",
+            checksum_uploads=False,
+            **options,
+        )
+    if backend == "cos":
+        return S3StorageService(
+            settings.cos_bucket_name,
+            region=settings.cos_region,
+            endpoint_url=f"https://cos.{settings.cos_region}.myqcloud.com",
+            access_key=settings.cos_secret_id,
+            secret_key=settings.cos_secret_key,
+            addressing_style="virtual",
+            checksum_uploads=False,
+            **options,
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_storage_service: Optional[StorageService] = None
+
 
 def get_storage_service() -> StorageService:
-    return LocalStorageService()
+    global _storage_service
+    if _storage_service is None:
+        _storage_service = create_storage_service()
+    return _storage_service
+
+
+async def close_storage_service():
+    global _storage_service
+    if _storage_service is not None:
+        await _storage_service.close()
+        _storage_service = None
@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, List, Optional
+import asyncio
+import math
+import os
+import shutil
+import time
+import uuid
+
+from loguru import logger
+from sqlalchemy import delete
+
+from core.config import get_settings
+from core.database import AsyncSessionLocal
+from models.upload_session import UploadSession
+
+settings = get_settings()
+
+
+class ChunkSizeMismatch(Exception):
+    pass
+
+
+def new_upload_session(user_id: int, filename: str, content_type: Optional[str], size: int) -> UploadSession:
+    chunk_size = settings.upload_session_chunk_size
+    return UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        chunk_size=chunk_size,
+        total_chunks=math.ceil(size / chunk_size),
+        expires_at=datetime.utcnow() + timedelta(hours=settings.upload_session_ttl_hours),
+    )
+
+
+def session_dir(session_id: str) -> str:
+    return os.path.join(settings.upload_session_dir, session_id)
+
+
+def expected_chunk_size(session: UploadSession, index: int) -> int:
+    if index == session.total_chunks - 1:
+        return session.size - session.chunk_size * (session.total_chunks - 1)
+    return session.chunk_size
+
+
+def _open_chunk(session_id: str, tmp_name: str):
+    os.makedirs(session_dir(session_id), exist_ok=True)
+    return open(os.path.join(session_dir(session_id), tmp_name), "wb")
+
+
+def _discard(f, path: str):
+    f.close()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def write_chunk(session: UploadSession, index: int, chunks: AsyncIterable[bytes]) -> int:
+    expected = expected_chunk_size(session, index)
+    # Retries of the same chunk may race; each writes its own temp file and
+    # the last complete one wins the rename.
+    tmp_name = f"{index}.{uuid.uuid4().hex[:8]}.tmp"
+    final_path = os.path.join(session_dir(session.id), str(index))
+    tmp_path = os.path.join(session_dir(session.id), tmp_name)
+
+    f = await asyncio.to_thread(_open_chunk, session.id, tmp_name)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > expected:
+                raise ChunkSizeMismatch(index)
+            if chunk:
+                await asyncio.to_thread(f.write, chunk)
+        if size != expected:
+            raise ChunkSizeMismatch(index)
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, tmp_path, final_path)
+    except BaseException:
+        await asyncio.to_thread(_discard, f, tmp_path)
+        raise
+
+    return size
+
+
+def _list_chunks(session_id: str) -> List[int]:
+    try:
+        names = os.listdir(session_dir(session_id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+async def received_chunks(session: UploadSession) -> List[int]:
+    return await asyncio.to_thread(_list_chunks, session.id)
+
+
+def _read_part(f, size: int) -> bytes:
+    return f.read(size)
+
+
+async def iter_assembled(session: UploadSession, read_size: int = None) -> AsyncIterator[bytes]:
+    read_size = read_size or settings.upload_chunk_size
+    for index in range(session.total_chunks):
+        path = os.path.join(session_dir(session.id), str(index))
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                data = await asyncio.to_thread(_read_part, f, read_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+async def discard_session_files(session_id: str):
+    await asyncio.to_thread(shutil.rmtree, session_dir(session_id), True)
+
+
+def _stale_dirs(max_age: float) -> List[str]:
+    root = settings.upload_session_dir
+    if not os.path.isdir(root):
+        return []
+    cutoff = time.time() - max_age
+    return [
+        name for name in os.listdir(root)
+        if os.path.getmtime(os.path.join(root, name)) < cutoff
+    ]
+
+
+class UploadSessionJanitor:
+    def __init__(self, interval: float = 600.0, ttl: float = 86400.0):
+        self.interval = interval
+        self.ttl = ttl
+        self._task: Optional[asyncio.Task] = None
+        self.collected = 0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Upload session cleanup failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def collect(self) -> int:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(UploadSession)
+                .where(UploadSession.expires_at < datetime.utcnow())
+                .returning(UploadSession.id)
+            )
+            expired = list(result.scalars().all())
+            await db.commit()
+
+        # Directories can also outlive their row if a worker died between
+        # finalizing and cleaning up; anything untouched for a full TTL goes.
+        stale = await asyncio.to_thread(_stale_dirs, self.ttl)
+        removed = set(expired) | set(stale)
+        for session_id in removed:
+            await discard_session_files(session_id)
+
+        if removed:
+            logger.info(f"Removed {len(removed)} abandoned upload sessions")
+        self.collected += len(removed)
+        return len(removed)
+
+
+upload_session_janitor = UploadSessionJanitor(
+    interval=settings.upload_session_gc_interval_seconds,
+    ttl=settings.upload_session_ttl_hours * 3600,
+)
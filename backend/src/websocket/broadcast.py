@@ -0,0 +1,162 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional, Set
+import asyncio
+import uuid
+
+from loguru import logger
+
+from core.config import get_settings
+from websocket.envelope import Envelope
+
+DeliverCallback = Callable[[int, Envelope, Optional[int]], Awaitable[None]]
+InvalidateCallback = Callable[[List[int]], None]
+
+
+class BroadcastBackend(ABC):
+    def __init__(self):
+        self._deliver: Optional[DeliverCallback] = None
+        self._invalidate: Optional[InvalidateCallback] = None
+
+    def bind(self, deliver: DeliverCallback, invalidate: InvalidateCallback = None):
+        self._deliver = deliver
+        self._invalidate = invalidate
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def subscribe(self, room_id: int):
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, room_id: int):
+        pass
+
+    @abstractmethod
+    async def publish(self, room_id: int, envelope: Envelope, exclude_user_id: int = None):
+        pass
+
+    @abstractmethod
+    async def publish_invalidation(self, user_ids: List[int]):
+        pass
+
+
+class InMemoryBroadcastBackend(BroadcastBackend):
+    async def subscribe(self, room_id: int):
+        pass
+
+    async def unsubscribe(self, room_id: int):
+        pass
+
+    async def publish(self, room_id: int, envelope: Envelope, exclude_user_id: int = None):
+        await self._deliver(room_id, envelope, exclude_user_id)
+
+    async def publish_invalidation(self, user_ids: List[int]):
+        if self._invalidate:
+            self._invalidate(user_ids)
+
+
+class RedisBroadcastBackend(BroadcastBackend):
+    channel_prefix = "couple_space:room:"
+    control_channel = "couple_space:invalidate"
+
+    def __init__(self, redis_url: str):
+        super().__init__()
+        self.redis_url = redis_url
+        self.node_id = uuid.uuid4().hex
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._rooms: Set[int] = set()
+
+    def _channel(self, room_id: int) -> str:
+        return f"{self.channel_prefix}{room_id}"
+
+    async def start(self):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.control_channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub:
+            await self._pubsub.aclose()
+        if self._redis:
+            await self._redis.aclose()
+        self._rooms.clear()
+
+    async def subscribe(self, room_id: int):
+        if room_id in self._rooms:
+            return
+        self._rooms.add(room_id)
+        await self._pubsub.subscribe(self._channel(room_id))
+
+    async def unsubscribe(self, room_id: int):
+        if room_id not in self._rooms:
+            return
+        self._rooms.discard(room_id)
+        await self._pubsub.unsubscribe(self._channel(room_id))
+
+    async def publish(self, room_id: int, envelope: Envelope, exclude_user_id: int = None):
+        # Local participants are served directly; other nodes receive one copy
+        # each through the room channel and skip frames from their own node.
+        # The already-encoded body is forwarded as-is behind a small header.
+        await self._deliver(room_id, envelope, exclude_user_id)
+        header = (
+            f"{self.node_id}|{exclude_user_id or ''}|{envelope.type or ''}|"
+            f"{envelope.message_id or ''}|"
+        )
+        await self._redis.publish(self._channel(room_id), header + envelope.text)
+
+    async def publish_invalidation(self, user_ids: List[int]):
+        await self._redis.publish(self.control_channel, ",".join(str(i) for i in user_ids))
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+
+                frame = await self._pubsub.get_message(timeout=1.0)
+                if frame is None:
+                    continue
+
+                if frame["channel"] == self.control_channel:
+                    if self._invalidate:
+                        self._invalidate([int(i) for i in frame["data"].split(",") if i])
+                    continue
+
+                node_id, exclude, event_type, message_id, text = frame["data"].split("|", 4)
+                if node_id == self.node_id:
+                    continue
+
+                room_id = int(frame["channel"][len(self.channel_prefix):])
+                envelope = Envelope.from_text(
+                    text, event_type or None, int(message_id) if message_id else None
+                )
+                await self._deliver(room_id, envelope, int(exclude) if exclude else None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis broadcast listener error: {e}")
+                await asyncio.sleep(1)
+
+
+def get_broadcast_backend() -> BroadcastBackend:
+    settings = get_settings()
+    if settings.broadcast_backend == "redis":
+        return RedisBroadcastBackend(settings.redis_url)
+    return InMemoryBroadcastBackend()
@@ -0,0 +1,134 @@
+from fastapi import WebSocket
+from typing import Iterable, List, Optional, Set
+import asyncio
+import time
+
+from loguru import logger
+
+from core.metrics import ws_send_duration
+from websocket.envelope import Envelope
+
+OVERFLOW_DROP_EPHEMERAL = "drop_ephemeral"
+OVERFLOW_DISCONNECT = "disconnect"
+
+# Events that are superseded by the next one and can be lost without harm.
+EPHEMERAL_EVENTS = {"user_typing", "pong"}
+
+
+class ClientConnection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        max_queue_size: int = 256,
+        overflow_policy: str = OVERFLOW_DROP_EPHEMERAL,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.overflow_policy = overflow_policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.sent = 0
+        self.dropped = 0
+        self.overflowed = False
+        self.closed = False
+        self.max_queue_size = max_queue_size
+        # While a catch-up sync is streaming, live events are parked here and
+        # anything the sync already sent is dropped on release. Ids are not
+        # committed in order, so only ids the sync returned count as covered.
+        self._held: Optional[List[Envelope]] = None
+        self._synced: Set[int] = set()
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def stop(self):
+        self.closed = True
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+
+    def hold(self):
+        if self._held is None:
+            self._held = []
+
+    async def release(self, synced_ids: Iterable[int]):
+        # Kept until the next sync: a live copy published before the sync read
+        # its row may still be on its way from another node.
+        self._synced = set(synced_ids)
+        # Events keep landing in the hold list while it drains, so order holds.
+        while self._held:
+            envelope = self._held.pop(0)
+            if not self._covered(envelope):
+                await self.send_blocking(envelope)
+        self._held = None
+
+    def _covered(self, envelope: Envelope) -> bool:
+        return envelope.message_id is not None and envelope.message_id in self._synced
+
+    async def send_blocking(self, envelope: Envelope):
+        while not (self.overflowed or self.closed):
+            try:
+                await asyncio.wait_for(self.queue.put(envelope), timeout=1.0)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    def enqueue(self, envelope: Envelope) -> bool:
+        if self.overflowed or self.closed:
+            return False
+
+        if self._covered(envelope):
+            return False
+
+        if self._held is not None:
+            if len(self._held) < self.max_queue_size:
+                self._held.append(envelope)
+                return True
+        else:
+            try:
+                self.queue.put_nowait(envelope)
+                return True
+            except asyncio.QueueFull:
+                pass
+
+        self.dropped += 1
+        if self.overflow_policy == OVERFLOW_DROP_EPHEMERAL and envelope.type in EPHEMERAL_EVENTS:
+            return False
+
+        self._disconnect_slow_consumer()
+        return False
+
+    def _disconnect_slow_consumer(self):
+        logger.warning(
+            f"WebSocket send queue overflow for user {self.user_id} "
+            f"(depth={self.depth}), disconnecting"
+        )
+        self.overflowed = True
+        self.stop()
+        self._closer = asyncio.create_task(self._close())
+
+    async def _close(self):
+        try:
+            await self.websocket.close(code=4008, reason="发送队列已满")
+        except Exception:
+            pass
+
+    async def _write_loop(self):
+        while True:
+            envelope = await self.queue.get()
+            try:
+                started = time.perf_counter()
+                await self.websocket.send_text(envelope.text)
+                ws_send_duration.observe(time.perf_counter() - started)
+                self.sent += 1
+            except Exception as e:
+                # The receive loop notices the closed socket and cleans up.
+                logger.debug(f"WebSocket writer for user {self.user_id} stopped: {e}")
+                self.closed = True
+                return
@@ -0,0 +1,48 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional
+
+from models import User
+
+
+class ConnectionContext:
+    def __init__(
+        self,
+        user_id: int,
+        username: str,
+        couple_id: Optional[int] = None,
+        partner_id: Optional[int] = None,
+        room_id: Optional[int] = None,
+    ):
+        self.user_id = user_id
+        self.username = username
+        self.couple_id = couple_id
+        self.partner_id = partner_id
+        self.room_id = room_id
+        self.stale = False
+
+    @property
+    def can_chat(self) -> bool:
+        return bool(self.couple_id and self.partner_id and self.room_id)
+
+
+async def load_connection_context(db: AsyncSession, user: User) -> ConnectionContext:
+    from services.couple_graph import couple_graph_cache
+
+    context = ConnectionContext(user.id, user.username, user.couple_id)
+    if not user.couple_id:
+        return context
+
+    graph = await couple_graph_cache.get(db, user.couple_id)
+    context.partner_id = graph.partner_of(user.id)
+    context.room_id = graph.room_id
+
+    return context
+
+
+async def reload_connection_context(db: AsyncSession, context: ConnectionContext) -> ConnectionContext:
+    result = await db.execute(select(User).where(User.id == context.user_id))
+    user = result.scalar_one_or_none()
+    if user is None:
+        return ConnectionContext(context.user_id, context.username)
+    return await load_connection_context(db, user)
@@ -0,0 +1,48 @@
+from typing import Optional, Union
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+
+        _encoder = msgspec.json.Encoder()
+        dumps = _encoder.encode
+        loads = msgspec.json.decode
+    except ImportError:
+        import json
+
+        def dumps(obj) -> bytes:
+            return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+        loads = json.loads
+
+
+class Envelope:
+    __slots__ = ("type", "message_id", "data", "text")
+
+    def __init__(self, message: dict, message_id: Optional[int] = None):
+        self.type: Optional[str] = message.get("type")
+        self.message_id = message_id
+        self.data: bytes = dumps(message)
+        self.text: str = self.data.decode()
+
+    @classmethod
+    def from_text(cls, text: str, type: Optional[str] = None, message_id: Optional[int] = None) -> "Envelope":
+        envelope = cls.__new__(cls)
+        envelope.type = type
+        envelope.message_id = message_id
+        envelope.text = text
+        envelope.data = text.encode()
+        return envelope
+
+
+def to_envelope(message: Union[dict, Envelope]) -> Envelope:
+    if isinstance(message, Envelope):
+        return message
+    return Envelope(message)
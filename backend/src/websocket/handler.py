@@ -1,184 +1,297 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from loguru import logger
+from pydantic import ValidationError
 from sqlalchemy import select
-import json
 
-from core.database import get_db
-from models import User, Room, Message
+from core.config import get_settings
+from core.database import AsyncSessionLocal
+from core.query_stats import track_queries
+from models import Message
+from services.message_writer import message_writer
+from services.read_receipts import read_receipts, get_read_state, unread_payload
+from websocket.connection import ClientConnection
 from websocket.manager import manager, get_current_user_ws
+from websocket.context import ConnectionContext, load_connection_context, reload_connection_context
+from websocket.envelope import Envelope, loads, to_envelope
+from websocket.typing_state import typing_tracker
 from schemas.message import MessageCreate, MessageResponse
 from datetime import datetime
 
+settings = get_settings()
+
 router = APIRouter()
 
 
+@router.get("/stats")
+async def websocket_stats():
+    return {
+        **manager.get_stats(),
+        "typing_received": typing_tracker.received,
+        "typing_forwarded": typing_tracker.forwarded,
+    }
+
+
+async def refresh_context(context: ConnectionContext) -> ConnectionContext:
+    async with AsyncSessionLocal() as db:
+        fresh = await reload_connection_context(db, context)
+
+    if fresh.room_id != context.room_id:
+        if context.room_id:
+            await manager.leave_room(context.user_id, context.room_id)
+        if fresh.room_id:
+            await manager.join_room(fresh.user_id, fresh.room_id)
+
+    manager.set_context(fresh.user_id, fresh)
+    return fresh
+
+
+async def close_connection(connection: ClientConnection, context: ConnectionContext, username: str):
+    # Nothing to do if a reconnect already replaced this socket: the user is
+    # still online and the new connection owns the room membership.
+    if not manager.disconnect(context.user_id, connection):
+        return
+    typing_tracker.discard(context.user_id)
+
+    if context.room_id:
+        await manager.leave_room(context.user_id, context.room_id, connection)
+
+        await manager.broadcast_to_room(
+            {
+                "type": "user_offline",
+                "user_id": context.user_id,
+                "username": username,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            context.room_id
+        )
+
+
+async def sync_missed_messages(context: ConnectionContext, last_seen_id: int):
+    connection = manager.get_connection(context.user_id)
+    if connection is None or not context.room_id:
+        return
+
+    # Live events are held back while the backlog streams, then replayed
+    # without the ones the backlog already sent.
+    connection.hold()
+    last_id = last_seen_id
+    synced_ids = set()
+    try:
+        has_more = False
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Message)
+                    .where(Message.room_id == context.room_id, Message.id > last_id)
+                    .order_by(Message.id)
+                    .limit(settings.ws_sync_chunk_size)
+                )
+                messages = result.scalars().all()
+
+            if not messages:
+                break
+
+            await connection.send_blocking(Envelope({
+                "type": "sync_chunk",
+                "messages": [
+                    MessageResponse.model_validate(m).model_dump(mode="json")
+                    for m in messages
+                ],
+            }))
+            last_id = messages[-1].id
+            synced_ids.update(m.id for m in messages)
+
+            if len(messages) < settings.ws_sync_chunk_size:
+                break
+            if len(synced_ids) >= settings.ws_sync_max_messages:
+                has_more = True
+                break
+
+        await connection.send_blocking(Envelope({
+            "type": "sync_done",
+            "last_id": last_id,
+            "has_more": has_more,
+        }))
+    finally:
+        await connection.release(synced_ids)
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
     token: str = Query(...),
-    db: AsyncSession = Depends(get_db),
+    last_seen_id: int | None = Query(None),
 ):
-    current_user = await get_current_user_ws(token, db)
+    # Sessions are opened per event and returned to the pool straight away so
+    # that idle sockets do not pin database connections.
+    with track_queries("ws connect"):
+        async with AsyncSessionLocal() as db:
+            current_user = await get_current_user_ws(token, db)
+            if current_user:
+                context = await load_connection_context(db, current_user)
+                read_state = None
+                if context.room_id:
+                    read_state = await get_read_state(db, current_user.id, context.room_id)
+
     if not current_user:
         await websocket.close(code=4001, reason="无效的认证凭据")
         return
 
     user_id = current_user.id
 
-    await manager.connect(websocket, user_id)
+    connection = await manager.connect(websocket, user_id)
+    manager.set_context(user_id, context)
+
+    typing_envelopes = {
+        is_typing: Envelope({"type": "user_typing", "user_id": user_id, "is_typing": is_typing})
+        for is_typing in (True, False)
+    }
+
+    if context.room_id:
+        if last_seen_id is not None:
+            # Held from before the room subscription: anything published while
+            # the handshake awaits I/O would otherwise go out live and again
+            # inside the sync. Released by sync_missed_messages.
+            connection.hold()
+
+        await manager.join_room(user_id, context.room_id)
 
-    if current_user.couple_id:
-        result = await db.execute(
-            select(Room).where(Room.couple_id == current_user.couple_id)
+        # Straight to the send queue, ahead of any held live events.
+        await connection.send_blocking(to_envelope({
+            "type": "connected",
+            "message": "已连接到聊天室",
+            "room_id": context.room_id,
+        }))
+        await connection.send_blocking(to_envelope(unread_payload(context.room_id, read_state)))
+
+        await manager.broadcast_to_room(
+            {
+                "type": "user_online",
+                "user_id": user_id,
+                "username": current_user.username,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+            context.room_id,
+            exclude_user_id=user_id
         )
-        room = result.scalar_one_or_none()
-
-        if room:
-            manager.join_room(user_id, room.id)
-
-            await manager.send_personal(
-                {
-                    "type": "connected",
-                    "message": "已连接到聊天室",
-                    "room_id": room.id,
-                },
-                user_id
-            )
-
-            await manager.broadcast_to_room(
-                {
-                    "type": "user_online",
-                    "user_id": user_id,
-                    "username": current_user.username,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-                room.id,
-                exclude_user_id=user_id
-            )
+
+        if last_seen_id is not None:
+            await sync_missed_messages(context, last_seen_id)
 
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = loads(data)
 
             message_type = message_data.get("type")
 
-            if message_type == "ping":
-                await manager.send_personal(
-                    {"type": "pong", "timestamp": datetime.utcnow().isoformat()},
-                    user_id
-                )
+            with track_queries(f"ws {message_type}"):
+                if context.stale:
+                    context = await refresh_context(context)
 
-            elif message_type == "send_message":
-                content = message_data.get("content")
-                msg_type = message_data.get("message_type", "text")
-                room_id = message_data.get("room_id")
+                if message_type == "sync":
+                    last_id = message_data.get("last_seen_id")
+                    if isinstance(last_id, int):
+                        await sync_missed_messages(context, last_id)
 
-                if not content or not room_id:
+                elif message_type == "ping":
                     await manager.send_personal(
-                        {"type": "error", "message": "消息内容或房间ID不能为空"},
+                        {"type": "pong", "timestamp": datetime.utcnow().isoformat()},
                         user_id
                     )
-                    continue
 
-                if current_user.couple_id:
-                    partner_result = await db.execute(
-                        select(User).where(
-                            User.couple_id == current_user.couple_id,
-                            User.id != user_id
+                elif message_type == "send_message":
+                    room_id = message_data.get("room_id")
+
+                    if not message_data.get("content") or not room_id:
+                        await manager.send_personal(
+                            {"type": "error", "message": "消息内容或房间ID不能为空"},
+                            user_id
                         )
-                    )
-                    partner = partner_result.scalar_one_or_none()
+                        continue
 
-                    room_result = await db.execute(
-                        select(Room).where(Room.id == room_id, Room.couple_id == current_user.couple_id)
-                    )
-                    room = room_result.scalar_one_or_none()
-
-                    if partner and room:
-                        new_message = Message(
-                            content=content,
-                            message_type=msg_type,
-                            sender_id=user_id,
-                            receiver_id=partner.id,
-                            room_id=room.id,
+                    # Same limits as POST /messages.
+                    try:
+                        payload = MessageCreate(
+                            content=message_data["content"],
+                            message_type=message_data.get("message_type", "text"),
+                        )
+                    except ValidationError:
+                        await manager.send_personal(
+                            {"type": "error", "message": "消息内容无效"},
+                            user_id
                         )
-                        db.add(new_message)
-                        await db.commit()
-                        await db.refresh(new_message)
+                        continue
+                    content, msg_type = payload.content, payload.message_type
+
+                    if context.can_chat and room_id == context.room_id:
+                        # A sent message ends the typing burst on the partner's side.
+                        typing_tracker.discard(user_id)
+                        try:
+                            new_message = await message_writer.write({
+                                "content": content,
+                                "message_type": msg_type,
+                                "sender_id": user_id,
+                                "receiver_id": context.partner_id,
+                                "room_id": context.room_id,
+                            })
+                        except Exception as e:
+                            logger.error(f"Message from user {user_id} was not saved: {e}")
+                            await manager.send_personal(
+                                {"type": "error", "message": "消息发送失败"},
+                                user_id
+                            )
+                            continue
 
-                        message_response = {
+                        message_response = Envelope({
                             "type": "new_message",
                             "message": {
                                 "id": new_message.id,
-                                "content": new_message.content,
-                                "message_type": new_message.message_type,
-                                "sender_id": new_message.sender_id,
-                                "receiver_id": new_message.receiver_id,
-                                "room_id": new_message.room_id,
+                                "content": content,
+                                "message_type": msg_type,
+                                "sender_id": user_id,
+                                "receiver_id": context.partner_id,
+                                "room_id": context.room_id,
                                 "created_at": new_message.created_at.isoformat(),
                             }
-                        }
+                        }, message_id=new_message.id)
 
                         await manager.send_personal(message_response, user_id)
-                        await manager.broadcast_to_room(message_response, room.id, exclude_user_id=user_id)
-
-            elif message_type == "typing":
-                room_id = message_data.get("room_id")
-                is_typing = message_data.get("is_typing", False)
-
-                if current_user.couple_id and room_id:
-                    await manager.broadcast_to_room(
-                        {
-                            "type": "user_typing",
-                            "user_id": user_id,
-                            "is_typing": is_typing,
-                        },
-                        room_id,
-                        exclude_user_id=user_id
-                    )
+                        await manager.broadcast_to_room(message_response, context.room_id, exclude_user_id=user_id)
 
-            elif message_type == "read_receipt":
-                message_id = message_data.get("message_id")
+                elif message_type == "typing":
+                    room_id = message_data.get("room_id")
+                    is_typing = bool(message_data.get("is_typing", False))
 
-                if current_user.couple_id:
-                    result = await db.execute(
-                        select(Room).where(Room.couple_id == current_user.couple_id)
-                    )
-                    room = result.scalar_one_or_none()
-                    if room:
+                    if (
+                        context.room_id
+                        and room_id == context.room_id
+                        and typing_tracker.update(user_id, context.room_id, is_typing)
+                    ):
+                        await manager.broadcast_to_room(
+                            typing_envelopes[is_typing],
+                            context.room_id,
+                            exclude_user_id=user_id
+                        )
+
+                elif message_type == "read_receipt":
+                    message_id = message_data.get("message_id")
+
+                    if context.room_id and isinstance(message_id, int):
+                        read_receipts.mark_read(user_id, context.room_id, message_id)
                         await manager.broadcast_to_room(
                             {
                                 "type": "message_read",
                                 "message_id": message_id,
                                 "user_id": user_id,
                             },
-                            room.id,
+                            context.room_id,
                             exclude_user_id=user_id
                         )
 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
-
-        if current_user.couple_id:
-            result = await db.execute(
-                select(Room).where(Room.couple_id == current_user.couple_id)
-            )
-            room = result.scalar_one_or_none()
-
-            if room:
-                manager.leave_room(user_id, room.id)
-
-                await manager.broadcast_to_room(
-                    {
-                        "type": "user_offline",
-                        "user_id": user_id,
-                        "username": current_user.username,
-                        "timestamp": datetime.utcnow().isoformat(),
-                    },
-                    room.id
-                )
+        await close_connection(connection, context, current_user.username)
 
     except Exception as e:
-        manager.disconnect(user_id)
+        await close_connection(connection, context, current_user.username)
         await websocket.close(code=4000, reason=f"发生错误: {str(e)}")
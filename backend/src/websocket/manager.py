@@ -1,48 +1,133 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Dict, Set
-import json
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+import time
 
+from core.config import get_settings
 from core.database import get_db
+from core.metrics import registry, ws_broadcast_duration
 from models import User, Room
 from core.security import decode_access_token
+from websocket.broadcast import BroadcastBackend, InMemoryBroadcastBackend, get_broadcast_backend
+from websocket.connection import ClientConnection, OVERFLOW_DROP_EPHEMERAL
+from websocket.context import ConnectionContext
+from websocket.envelope import Envelope, to_envelope
+
+settings = get_settings()
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
+    def __init__(
+        self,
+        backend: BroadcastBackend = None,
+        send_queue_size: int = 256,
+        overflow_policy: str = OVERFLOW_DROP_EPHEMERAL,
+    ):
+        self.active_connections: Dict[int, ClientConnection] = {}
         self.room_participants: Dict[int, Set[int]] = {}
-
-    async def connect(self, websocket: WebSocket, user_id: int):
+        self.contexts: Dict[int, ConnectionContext] = {}
+        self._invalidation_listeners: List[Callable[[List[int]], None]] = []
+        self.send_queue_size = send_queue_size
+        self.overflow_policy = overflow_policy
+        self._closed_dropped = 0
+        self._closed_overflows = 0
+        self.backend = backend or InMemoryBroadcastBackend()
+        self.backend.bind(self._deliver_local, self._invalidate_local)
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> ClientConnection:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-
-    def join_room(self, user_id: int, room_id: int):
+        self.disconnect(user_id)
+        connection = ClientConnection(
+            websocket,
+            user_id,
+            max_queue_size=self.send_queue_size,
+            overflow_policy=self.overflow_policy,
+        )
+        connection.start()
+        self.active_connections[user_id] = connection
+        return connection
+
+    def _is_replaced(self, user_id: int, connection: Optional[ClientConnection]) -> bool:
+        # A reconnect replaces the user's connection; teardown of the old
+        # socket can still arrive afterwards and must leave the new one alone.
+        current = self.active_connections.get(user_id)
+        return connection is not None and current is not None and current is not connection
+
+    def disconnect(self, user_id: int, connection: Optional[ClientConnection] = None) -> bool:
+        if self._is_replaced(user_id, connection):
+            return False
+        self.contexts.pop(user_id, None)
+        connection = self.active_connections.pop(user_id, None)
+        if connection:
+            connection.stop()
+            self._closed_dropped += connection.dropped
+            self._closed_overflows += int(connection.overflowed)
+        return True
+
+    def get_connection(self, user_id: int) -> Optional[ClientConnection]:
+        return self.active_connections.get(user_id)
+
+    def set_context(self, user_id: int, context: ConnectionContext):
+        self.contexts[user_id] = context
+
+    def get_context(self, user_id: int) -> Optional[ConnectionContext]:
+        return self.contexts.get(user_id)
+
+    def add_invalidation_listener(self, listener: Callable[[List[int]], None]):
+        self._invalidation_listeners.append(listener)
+
+    async def invalidate_contexts(self, user_ids: Iterable[int]):
+        await self.backend.publish_invalidation(list(user_ids))
+
+    def _invalidate_local(self, user_ids: List[int]):
+        for listener in self._invalidation_listeners:
+            listener(user_ids)
+        for user_id in user_ids:
+            context = self.contexts.get(user_id)
+            if context:
+                context.stale = True
+
+    async def join_room(self, user_id: int, room_id: int):
         if room_id not in self.room_participants:
             self.room_participants[room_id] = set()
         self.room_participants[room_id].add(user_id)
+        await self.backend.subscribe(room_id)
 
-    def leave_room(self, user_id: int, room_id: int):
+    async def leave_room(self, user_id: int, room_id: int, connection: Optional[ClientConnection] = None):
+        if self._is_replaced(user_id, connection):
+            return
         if room_id in self.room_participants:
             self.room_participants[room_id].discard(user_id)
+            if not self.room_participants[room_id]:
+                del self.room_participants[room_id]
+                await self.backend.unsubscribe(room_id)
 
-    async def send_personal(self, message: dict, user_id: int):
+    async def send_personal(self, message: Union[dict, Envelope], user_id: int):
         if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(json.dumps(message))
+            self.active_connections[user_id].enqueue(to_envelope(message))
 
-    async def broadcast_to_room(self, message: dict, room_id: int, exclude_user_id: int = None):
+    async def broadcast_to_room(
+        self, message: Union[dict, Envelope], room_id: int, exclude_user_id: int = None
+    ):
+        started = time.perf_counter()
+        await self.backend.publish(room_id, to_envelope(message), exclude_user_id)
+        ws_broadcast_duration.observe(time.perf_counter() - started)
+
+    async def _deliver_local(self, room_id: int, envelope: Envelope, exclude_user_id: int = None):
         if room_id not in self.room_participants:
             return
 
         for user_id in self.room_participants[room_id]:
             if exclude_user_id is None or user_id != exclude_user_id:
                 if user_id in self.active_connections:
-                    await self.active_connections[user_id].send_text(json.dumps(message))
+                    self.active_connections[user_id].enqueue(envelope)
 
     def get_room_users(self, room_id: int) -> Set[int]:
         return self.room_participants.get(room_id, set())
@@ -50,8 +135,37 @@ class ConnectionManager:
     def is_user_online(self, user_id: int) -> bool:
         return user_id in self.active_connections
 
-
-manager = ConnectionManager()
+    def get_stats(self) -> dict:
+        connections = list(self.active_connections.values())
+        depths = [c.depth for c in connections]
+        return {
+            "connections": len(connections),
+            "rooms": len(self.room_participants),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self._closed_dropped + sum(c.dropped for c in connections),
+            "slow_consumer_disconnects": self._closed_overflows + sum(c.overflowed for c in connections),
+        }
+
+
+manager = ConnectionManager(
+    get_broadcast_backend(),
+    send_queue_size=settings.ws_send_queue_size,
+    overflow_policy=settings.ws_overflow_policy,
+)
+
+registry.callback_gauge(
+    "ws_connections", "Open WebSocket connections on this worker",
+    lambda: {(): len(manager.active_connections)},
+)
+registry.callback_gauge(
+    "ws_rooms", "Rooms with at least one local participant",
+    lambda: {(): len(manager.room_participants)},
+)
+registry.callback_gauge(
+    "ws_queued_messages", "Frames waiting in per-connection send queues",
+    lambda: {(): sum(c.depth for c in manager.active_connections.values())},
+)
 
 
 async def get_current_user_ws(
@@ -0,0 +1,94 @@
+from typing import Dict, Optional
+import asyncio
+
+from core.config import get_settings
+from websocket.envelope import Envelope
+from websocket.manager import ConnectionManager, manager
+
+settings = get_settings()
+
+
+class TypingState:
+    __slots__ = ("room_id", "forwarded_at", "expires_at", "timer")
+
+    def __init__(self, room_id: int, now: float, expires_at: float):
+        self.room_id = room_id
+        self.forwarded_at = now
+        self.expires_at = expires_at
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class TypingTracker:
+    def __init__(self, manager: ConnectionManager, refresh_interval: float = 3.0, timeout: float = 6.0):
+        self.manager = manager
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.states: Dict[int, TypingState] = {}
+        self.received = 0
+        self.forwarded = 0
+
+    def update(self, user_id: int, room_id: int, is_typing: bool) -> bool:
+        self.received += 1
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        state = self.states.get(user_id)
+
+        if not is_typing:
+            if state is None:
+                return False
+            self._clear(user_id)
+            self.forwarded += 1
+            return True
+
+        if state is None or state.room_id != room_id:
+            if state:
+                self._clear(user_id)
+            state = TypingState(room_id, now, now + self.timeout)
+            state.timer = loop.call_at(state.expires_at, self._expire, user_id)
+            self.states[user_id] = state
+            self.forwarded += 1
+            return True
+
+        # Still typing: push the expiry out (the timer re-arms itself when it
+        # fires early) and only refresh the partner once per interval.
+        state.expires_at = now + self.timeout
+        if now - state.forwarded_at >= self.refresh_interval:
+            state.forwarded_at = now
+            self.forwarded += 1
+            return True
+        return False
+
+    def discard(self, user_id: int):
+        self._clear(user_id)
+
+    def _clear(self, user_id: int):
+        state = self.states.pop(user_id, None)
+        if state and state.timer:
+            state.timer.cancel()
+
+    def _expire(self, user_id: int):
+        state = self.states.get(user_id)
+        if state is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        if loop.time() < state.expires_at:
+            state.timer = loop.call_at(state.expires_at, self._expire, user_id)
+            return
+
+        del self.states[user_id]
+        self.forwarded += 1
+        loop.create_task(
+            self.manager.broadcast_to_room(
+                Envelope({"type": "user_typing", "user_id": user_id, "is_typing": False}),
+                state.room_id,
+                exclude_user_id=user_id,
+            )
+        )
+
+
+typing_tracker = TypingTracker(
+    manager,
+    refresh_interval=settings.typing_refresh_interval_ms / 1000,
+    timeout=settings.typing_timeout_ms / 1000,
+)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from websocket.broadcast import RedisBroadcastBackend
+from websocket.envelope import loads
+from websocket.manager import ConnectionManager
+
+ROOM_ID = 7
+
+# Runs a second node in its own interpreter: it joins nobody and only
+# publishes, so anything the local socket receives came through Redis.
+PUBLISHER = """
+import asyncio, sys
+from websocket.broadcast import RedisBroadcastBackend
+from websocket.manager import ConnectionManager
+
+async def main():
+    node = ConnectionManager(RedisBroadcastBackend(sys.argv[1]))
+    await node.start()
+    await node.broadcast_to_room({"type": "new_message", "message": {"id": 1}}, int(sys.argv[2]))
+    await node.stop()
+
+asyncio.run(main())
+"""
+
+
+async def start_nodes(redis_url, count):
+    nodes = [ConnectionManager(RedisBroadcastBackend(redis_url)) for _ in range(count)]
+    for node in nodes:
+        await node.start()
+    return nodes
+
+
+async def stop_nodes(nodes):
+    for node in nodes:
+        for user_id in list(node.active_connections):
+            node.disconnect(user_id)
+        await node.stop()
+    # Let the cancelled writer tasks finish before the loop closes.
+    await asyncio.sleep(0)
+
+
+async def receive(websocket, timeout=2.0):
+    return loads(await asyncio.wait_for(websocket.sent.get(), timeout))
+
+
+async def test_broadcast_reaches_socket_on_another_node(redis_url, websocket_factory):
+    sender_node, receiver_node = await start_nodes(redis_url, 2)
+    try:
+        websocket = websocket_factory()
+        await receiver_node.connect(websocket, 2)
+        await receiver_node.join_room(2, ROOM_ID)
+
+        await sender_node.broadcast_to_room({"type": "user_online", "user_id": 1}, ROOM_ID)
+
+        assert await receive(websocket) == {"type": "user_online", "user_id": 1}
+    finally:
+        await stop_nodes([sender_node, receiver_node])
+
+
+async def test_each_socket_gets_one_copy_and_sender_is_excluded(redis_url, websocket_factory):
+    node_a, node_b = await start_nodes(redis_url, 2)
+    try:
+        sender, local_peer, remote_peer = websocket_factory(), websocket_factory(), websocket_factory()
+        await node_a.connect(sender, 1)
+        await node_a.connect(local_peer, 3)
+        await node_b.connect(remote_peer, 2)
+        for node, user_id in ((node_a, 1), (node_a, 3), (node_b, 2)):
+            await node.join_room(user_id, ROOM_ID)
+
+        await node_a.broadcast_to_room({"type": "new_message"}, ROOM_ID, exclude_user_id=1)
+        await node_a.broadcast_to_room({"type": "marker"}, ROOM_ID)
+
+        # The marker is published after the message, so once it arrives
+        # everywhere a duplicate would already have been delivered.
+        for websocket in (local_peer, remote_peer):
+            assert (await receive(websocket))["type"] == "new_message"
+            assert (await receive(websocket))["type"] == "marker"
+            assert websocket.drain() == []
+        assert (await receive(sender))["type"] == "marker"
+        assert sender.drain() == []
+    finally:
+        await stop_nodes([node_a, node_b])
+
+
+async def test_node_without_local_participants_is_not_subscribed(redis_url, websocket_factory):
+    node_a, node_b = await start_nodes(redis_url, 2)
+    try:
+        websocket = websocket_factory()
+        await node_b.connect(websocket, 2)
+        await node_b.join_room(2, ROOM_ID)
+        assert ROOM_ID not in node_a.backend._rooms
+        assert ROOM_ID in node_b.backend._rooms
+
+        await node_b.leave_room(2, ROOM_ID)
+        assert ROOM_ID not in node_b.backend._rooms
+    finally:
+        await stop_nodes([node_a, node_b])
+
+
+async def test_invalidation_reaches_every_node(redis_url):
+    node_a, node_b = await start_nodes(redis_url, 2)
+    received = asyncio.Queue()
+    node_b.add_invalidation_listener(received.put_nowait)
+    try:
+        await node_a.invalidate_contexts([5, 6])
+        assert await asyncio.wait_for(received.get(), 2.0) == [5, 6]
+    finally:
+        await stop_nodes([node_a, node_b])
+
+
+async def test_broadcast_from_another_process(redis_url, websocket_factory):
+    (node,) = await start_nodes(redis_url, 1)
+    try:
+        websocket = websocket_factory()
+        await node.connect(websocket, 2)
+        await node.join_room(2, ROOM_ID)
+
+        src = os.path.join(os.path.dirname(__file__), "..", "src")
+        publisher = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", PUBLISHER, redis_url, str(ROOM_ID),
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")]))},
+            stderr=subprocess.PIPE,
+        )
+        _, stderr = await asyncio.wait_for(publisher.communicate(), 30)
+        assert publisher.returncode == 0, stderr.decode()
+
+        assert (await receive(websocket))["type"] == "new_message"
+    finally:
+        await stop_nodes([node])
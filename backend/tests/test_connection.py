@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from websocket.broadcast import InMemoryBroadcastBackend
+from websocket.connection import ClientConnection, OVERFLOW_DISCONNECT, OVERFLOW_DROP_EPHEMERAL
+from websocket.envelope import Envelope, loads
+from websocket.manager import ConnectionManager
+
+ROOM_ID = 7
+
+
+def typing_event():
+    return Envelope({"type": "user_typing", "user_id": 1, "is_typing": True})
+
+
+def chat_event(message_id):
+    return Envelope({"type": "new_message", "message": {"id": message_id}}, message_id=message_id)
+
+
+async def stalled_connection(websocket, max_queue_size=4, overflow_policy=OVERFLOW_DROP_EPHEMERAL):
+    connection = ClientConnection(websocket, 2, max_queue_size=max_queue_size, overflow_policy=overflow_policy)
+    connection.start()
+    # The writer takes one frame and blocks in send_text; the queue behind
+    # it then fills up.
+    connection.enqueue(chat_event(1))
+    await asyncio.sleep(0)
+    for message_id in range(2, max_queue_size + 2):
+        assert connection.enqueue(chat_event(message_id))
+    return connection
+
+
+async def test_slow_consumer_drops_ephemeral_events(websocket_factory):
+    websocket = websocket_factory(blocked=True)
+    connection = await stalled_connection(websocket)
+
+    assert not connection.enqueue(typing_event())
+    assert connection.dropped == 1
+    assert not connection.overflowed
+    assert websocket.closed_with is None
+
+    connection.stop()
+
+
+async def test_full_queue_of_chat_events_disconnects(websocket_factory):
+    websocket = websocket_factory(blocked=True)
+    connection = await stalled_connection(websocket)
+
+    assert not connection.enqueue(chat_event(99))
+    assert connection.overflowed
+    await asyncio.sleep(0)
+    assert websocket.closed_with[0] == 4008
+    # Nothing more is queued once the consumer has been cut off.
+    assert not connection.enqueue(chat_event(100))
+
+
+async def test_disconnect_policy_also_disconnects_on_ephemeral_events(websocket_factory):
+    websocket = websocket_factory(blocked=True)
+    connection = await stalled_connection(websocket, overflow_policy=OVERFLOW_DISCONNECT)
+
+    assert not connection.enqueue(typing_event())
+    assert connection.overflowed
+
+
+async def test_queued_events_are_sent_in_order(websocket_factory):
+    websocket = websocket_factory(blocked=True)
+    connection = await stalled_connection(websocket)
+
+    websocket.unblock()
+    frames = [loads(await asyncio.wait_for(websocket.sent.get(), 1.0)) for _ in range(5)]
+    assert [frame["message"]["id"] for frame in frames] == [1, 2, 3, 4, 5]
+
+    connection.stop()
+
+
+async def test_slow_consumer_does_not_hold_up_the_room(websocket_factory):
+    manager = ConnectionManager(InMemoryBroadcastBackend(), send_queue_size=16)
+    fast, slow = websocket_factory(), websocket_factory(blocked=True)
+    await manager.connect(fast, 1)
+    await manager.connect(slow, 2)
+    await manager.join_room(1, ROOM_ID)
+    await manager.join_room(2, ROOM_ID)
+
+    burst = 1000
+    started = time.perf_counter()
+    for message_id in range(1, burst + 1):
+        await manager.broadcast_to_room(chat_event(message_id), ROOM_ID)
+        await manager.broadcast_to_room(typing_event(), ROOM_ID)
+        # Give the fast writer its turn, as the event loop would between
+        # incoming frames.
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    # Broadcasting never waits on the stalled socket.
+    assert elapsed < 5.0
+    received = [loads(frame) for frame in fast.drain()]
+    assert [f["message"]["id"] for f in received if f["type"] == "new_message"] == list(range(1, burst + 1))
+
+    slow_connection = manager.get_connection(2)
+    assert slow_connection.overflowed
+    assert manager.get_stats()["slow_consumer_disconnects"] == 1
+
+    for user_id in list(manager.active_connections):
+        manager.disconnect(user_id)
+    await asyncio.sleep(0)
+
+
+async def test_stale_socket_teardown_keeps_the_new_connection(websocket_factory):
+    manager = ConnectionManager(InMemoryBroadcastBackend())
+    old = await manager.connect(websocket_factory(), 2)
+    await manager.join_room(2, ROOM_ID)
+    new = await manager.connect(websocket_factory(), 2)
+
+    assert not manager.disconnect(2, old)
+    await manager.leave_room(2, ROOM_ID, old)
+    assert manager.get_connection(2) is new
+    assert manager.get_room_users(ROOM_ID) == {2}
+
+    assert manager.disconnect(2, new)
+    await asyncio.sleep(0)
+
+
+async def test_release_drops_only_events_the_sync_sent(websocket_factory):
+    websocket = websocket_factory()
+    connection = ClientConnection(websocket, 2)
+    connection.start()
+    connection.hold()
+    # 4 committed after the sync read 5 and 6, so only the live event has it.
+    for message_id in (5, 4, 6, 7):
+        assert connection.enqueue(chat_event(message_id))
+
+    await connection.release({5, 6})
+    # A late live copy of a synced message is still recognised.
+    assert not connection.enqueue(chat_event(6))
+
+    frames = [loads(await asyncio.wait_for(websocket.sent.get(), 1.0)) for _ in range(2)]
+    assert [frame["message"]["id"] for frame in frames] == [4, 7]
+    assert websocket.drain() == []
+
+    connection.stop()
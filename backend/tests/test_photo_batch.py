@@ -0,0 +1,78 @@
+from datetime import datetime
+from types import SimpleNamespace
+import hashlib
+import io
+
+from starlette.datastructures import Headers, UploadFile
+
+import api.v1.photos as photos_api
+import services.photo_ingest as photo_ingest
+from services.storage_service import StoredFile, content_filename
+
+
+class FakeStorage:
+    async def upload_content(self, chunks, content_type=None, max_size=None):
+        data = b"".join([chunk async for chunk in chunks])
+        sha256 = hashlib.sha256(data).hexdigest()
+        filename = content_filename(sha256)
+        return StoredFile(f"/uploads/{filename}", filename, len(data), sha256, content_type)
+
+
+class FakeSession:
+    # Commits fail while a photo named in fail_on is pending, as a
+    # constraint violation would.
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.pending = []
+        self.saved = []
+
+    def add_all(self, objects):
+        self.pending.extend(objects)
+
+    async def commit(self):
+        if any(photo.filename in self.fail_on for photo in self.pending):
+            raise RuntimeError("constraint violation")
+        for photo in self.pending:
+            photo.id = len(self.saved) + 1
+            photo.created_at = datetime.utcnow()
+            self.saved.append(photo)
+        self.pending = []
+
+    async def rollback(self):
+        self.pending = []
+
+    async def execute(self, statement):
+        pass
+
+    async def close(self):
+        pass
+
+
+def upload(filename, data):
+    return UploadFile(io.BytesIO(data), filename=filename, headers=Headers({"content-type": "image/jpeg"}))
+
+
+async def test_file_failing_during_ingest_does_not_fail_the_batch(monkeypatch):
+    discarded = []
+
+    async def acquire(db, stored_files):
+        return set()
+
+    async def discard(stored_files):
+        discarded.extend(stored.url for stored in stored_files)
+
+    monkeypatch.setattr(photos_api, "get_storage_service", FakeStorage)
+    monkeypatch.setattr(photos_api, "schedule_renditions", lambda photos: None)
+    monkeypatch.setattr(photo_ingest, "acquire", acquire)
+    monkeypatch.setattr(photo_ingest, "discard", discard)
+
+    db = FakeSession(fail_on={"bad.jpg"})
+    files = [upload("a.jpg", b"a"), upload("bad.jpg", b"bad"), upload("b.jpg", b"b")]
+    response = await photos_api.upload_photos_batch(SimpleNamespace(id=1), files, db)
+
+    assert (response.succeeded, response.failed) == (2, 1)
+    assert [item.filename for item in response.items] == ["a.jpg", "bad.jpg", "b.jpg"]
+    assert response.items[1].photo is None and response.items[1].error
+    assert [photo.filename for photo in db.saved] == ["a.jpg", "b.jpg"]
+    # The failed file's object has no reference and is removed.
+    assert discarded == [f"/uploads/{content_filename(hashlib.sha256(b'bad').hexdigest())}"]